@@ -1,39 +1,71 @@
 # app/api.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
+from urllib.parse import quote
 
 
 from app.svc import (
     save_override_payload,
     generate_packet_by_project,
     list_projects,
+    page_projects,
     open_folder,
     # company + catalog
     list_companies,
+    page_companies,
     upsert_company,
     get_company,
     list_cities,
     list_forms_for_city,
     generate_packet_for_company,
+    refresh_packets,
     # ✅ data + templates
     load_data,
+    page_data,
     get_blank_pdf_path,
     get_fields_json_path,
     get_layers_json_path,
     # ✅ ZIP download
-    generate_and_zip_project,
-    generate_and_zip_company,  # ✅ PATCH
+    # ✅ ZIP em streaming
+    stream_zip_project,
+    stream_zip_company,
+    stream_zip_packet,
+    # ✅ índice de templates
+    warm_template_index,
+    get_template_manifest,
+    get_template_pages,
+    PageRangeError,
+    # ✅ bootstrap da UI
+    get_bootstrap,
 )
+from app import data_store, http_cache, metrics, packet_jobs, pdf_engine, render_cache
+
+from app.log import get_logger, setup_logging
+
+setup_logging()
+log = get_logger("api")
+
 
-import app.svc as _svc_mod
-print("[API] api.py =", __file__)
-print("[API] svc.py loaded =", _svc_mod.__file__)
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # journals que sobraram (crash/CLI) viram snapshot antes de servir
+    data_store.compact_all()
+    warm_template_index()
+    render_cache.prune()
+    pdf_engine.start_pool()
+    yield
+    # ✅ jobs na fila não seguram o shutdown do uvicorn
+    packet_jobs.shutdown()
+    pdf_engine.shutdown_pools()
+    data_store.compact_all()
 
 
-app = FastAPI(title="Permit-Filler Internal API")
+app = FastAPI(title="Permit-Filler Internal API", lifespan=_lifespan)
 
 # ✅ Mantém seu CORS normal (ok)
 app.add_middleware(
@@ -45,6 +77,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # PDF.js precisa ler esses headers para carregar o PDF por Range
+    expose_headers=["Accept-Ranges", "Content-Range", "Content-Length", "ETag"],
 )
 
 # ✅ FIX HVHZ: força os headers CORS nos endpoints que o PDF.js usa
@@ -53,13 +87,15 @@ app.add_middleware(
 def _cors_headers(req: Request) -> Dict[str, str]:
     origin = req.headers.get("origin")
     # se vier origin (normal no browser), devolve exatamente ele
+    expose = {"Access-Control-Expose-Headers": "Accept-Ranges, Content-Range, Content-Length, ETag"}
     if origin:
         return {
             "Access-Control-Allow-Origin": origin,
             "Access-Control-Allow-Credentials": "true",
+            **expose,
         }
     # fallback: não deveria acontecer no seu caso, mas não quebra
-    return {"Access-Control-Allow-Origin": "*"}
+    return {"Access-Control-Allow-Origin": "*", **expose}
 
 
 # ============================
@@ -92,6 +128,12 @@ class DownloadCompanyPayload(BaseModel):  # ✅ PATCH
     roof_key: Optional[str] = None
 
 
+class RefreshPacketsPayload(BaseModel):
+    company_key: Optional[str] = None
+    project_key: Optional[str] = None
+    dry_run: bool = False
+
+
 class OpenFolderPayload(BaseModel):
     path: str
 
@@ -118,6 +160,15 @@ class GenerateCompanyPayload(BaseModel):
 def health():
     return {"ok": True}
 
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def api_metrics():
+    # ✅ formato texto do Prometheus (histogramas por estágio + contadores)
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 # ============================
 # Core
 # ============================
@@ -129,30 +180,29 @@ def save_override(payload: OverridePayload):
     return {"ok": True, **result}
 
 
-@app.post("/api/generate")
+# ⚠️ endpoints síncronos (generate/download): o front usa /api/jobs/*; ficam só pra scripts/integrações antigas
+@app.post("/api/generate", deprecated=True)
 def generate(payload: GeneratePayload):
     result = generate_packet_by_project(payload.project_key)
     return {"ok": True, **result}
 
 
-@app.post("/api/download-project")
+def _zip_stream_response(request: Request, chunks, filename: str) -> StreamingResponse:
+    # ✅ ZIP sai em streaming conforme cada form termina (sem zip intermediário no disco)
+    return StreamingResponse(
+        chunks,
+        media_type="application/zip",
+        headers={
+            **_cors_headers(request),
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+        },
+    )
+
+
+@app.post("/api/download-project", deprecated=True)
 def download_project(request: Request, payload: DownloadProjectPayload):
     try:
-        result = generate_and_zip_project(payload.project_key)
-        zip_path = result.get("zip_path")
-        if not zip_path:
-            raise HTTPException(
-                status_code=400,
-                detail="Não foi possível gerar o ZIP.",
-                headers=_cors_headers(request),
-            )
-
-        return FileResponse(
-            zip_path,
-            media_type="application/zip",
-            filename=f"{payload.project_key}.zip",
-            headers=_cors_headers(request),
-        )
+        chunks = stream_zip_project(payload.project_key)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -160,13 +210,20 @@ def download_project(request: Request, payload: DownloadProjectPayload):
             headers=_cors_headers(request),
         )
 
+    if chunks is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Não foi possível gerar o ZIP.",
+            headers=_cors_headers(request),
+        )
 
-@app.post("/api/download-company")  # ✅ PATCH
-def download_company(request: Request, payload: DownloadCompanyPayload):
-    import traceback
+    return _zip_stream_response(request, chunks, f"{payload.project_key}.zip")
 
+
+@app.post("/api/download-company", deprecated=True)  # ✅ PATCH
+def download_company(request: Request, payload: DownloadCompanyPayload):
     try:
-        result = generate_and_zip_company(
+        chunks = stream_zip_company(
             company_key=payload.company_key,
             city=payload.city,
             form_keys=payload.form_keys,
@@ -174,50 +231,82 @@ def download_company(request: Request, payload: DownloadCompanyPayload):
             owner_key=payload.owner_key,
             roof_key=payload.roof_key,
         )
-
-        # ✅ DEBUG: mostra no terminal o que voltou
-        print("[DEBUG api] generate_and_zip_company type =", type(result))
-        print("[DEBUG api] generate_and_zip_company preview =", repr(result)[:400])
-
-        # ✅ GUARDA: não deixa explodir em .get()
-        if not isinstance(result, dict):
-            raise TypeError(
-                f"generate_and_zip_company retornou {type(result)}: {repr(result)[:400]}"
-            )
-
-        zip_path = result.get("zip_path")
-        if not zip_path:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Não foi possível gerar o ZIP. result={result}",
-                headers=_cors_headers(request),
-            )
-
-        safe_name = payload.city or "packet"
-        return FileResponse(
-            zip_path,
-            media_type="application/zip",
-            filename=f"{safe_name}.zip",
-            headers=_cors_headers(request),
-        )
-
-    except HTTPException:
-        # mantém os 400/404 etc
-        raise
     except Exception as e:
-        # ✅ IMPRIME o traceback REAL no terminal
-        print("\n[ERROR] /api/download-company exception:")
-        traceback.print_exc()
+        # ✅ traceback REAL no log
+        log.exception("/api/download-company falhou", extra={"fields": {"company": payload.company_key, "city": payload.city}})
         raise HTTPException(
             status_code=500,
             detail=str(e),
             headers=_cors_headers(request),
         )
 
+    if chunks is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Não foi possível gerar o ZIP (nenhum form válido).",
+            headers=_cors_headers(request),
+        )
+
+    safe_name = payload.city or "packet"
+    return _zip_stream_response(request, chunks, f"{safe_name}.zip")
+
+
+@app.get("/api/bootstrap")
+def api_bootstrap(request: Request):
+    """Catálogo + companies + projects + tabelas num request só (ETag por versão dos dados)."""
+    boot = get_bootstrap()
+    gzipped = "gzip" in (request.headers.get("accept-encoding") or "").lower()
+    # ⚠️ ETag forte = 1 sequência de bytes: corpo gzip tem ETag própria (e o 304 compara com ela)
+    etag = http_cache.make_etag(boot["version"], "gz") if gzipped else http_cache.make_etag(boot["version"])
+    headers = {
+        **_cors_headers(request),
+        **http_cache.validator_headers(etag, None),
+        "Vary": "Accept-Encoding",
+    }
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    if http_cache.is_not_modified(request.headers, etag, None):
+        return Response(status_code=304, headers=headers)
+
+    return Response(boot["gzip"] if gzipped else boot["json"], media_type="application/json", headers=headers)
+
+
+def _split_fields(fields: Optional[str]) -> Optional[List[str]]:
+    out = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    return out or None
+
+
+def _wants_page(*params) -> bool:
+    # sem nenhum parâmetro → resposta antiga (lista inteira)
+    return any(p is not None for p in params)
+
+
+def _page_or_400(request: Request, fn, *args, **kwargs) -> Dict[str, Any]:
+    try:
+        return fn(*args, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e), headers=_cors_headers(request))
+
 
 @app.get("/api/projects")
-def projects():
-    return {"ok": True, "projects": list_projects()}
+def projects(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    company_key: Optional[str] = None,
+    city: Optional[str] = None,
+    prefix: Optional[str] = None,
+):
+    """?limit=&cursor= paginam; fields=a,b projeta; company_key/city/prefix (nome) filtram."""
+    if not _wants_page(cursor, limit, fields, company_key, city, prefix):
+        return {"ok": True, "projects": list_projects()}
+    page = _page_or_400(
+        request, page_projects,
+        cursor=cursor, limit=limit, fields=_split_fields(fields),
+        company_key=company_key, city=city, prefix=prefix,
+    )
+    return {"ok": True, **page}
 
 
 @app.post("/api/open-folder")
@@ -231,8 +320,23 @@ def api_open_folder(payload: OpenFolderPayload):
 
 
 @app.get("/api/companies")
-def api_companies():
-    return {"ok": True, "companies": list_companies()}
+def api_companies(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    company_key: Optional[str] = None,
+    city: Optional[str] = None,
+    prefix: Optional[str] = None,
+):
+    if not _wants_page(cursor, limit, fields, company_key, city, prefix):
+        return {"ok": True, "companies": list_companies()}
+    page = _page_or_400(
+        request, page_companies,
+        cursor=cursor, limit=limit, fields=_split_fields(fields),
+        company_key=company_key, city=city, prefix=prefix,
+    )
+    return {"ok": True, **page}
 
 
 @app.get("/api/companies/{company_key}")
@@ -260,7 +364,7 @@ def api_catalog_forms(city: str):
 # Generate por company/city/forms
 # ============================
 
-@app.post("/api/generate-company")
+@app.post("/api/generate-company", deprecated=True)  # ⚠️ front usa /api/jobs/generate-company
 def api_generate_company(payload: GenerateCompanyPayload):
     result = generate_packet_for_company(
         company_key=payload.company_key,
@@ -272,15 +376,104 @@ def api_generate_company(payload: GenerateCompanyPayload):
     )
     return {"ok": True, **result}
 
+@app.post("/api/packets/refresh")
+def api_refresh_packets(payload: RefreshPacketsPayload):
+    """Re-renderiza só os forms de packets existentes cujos dados/template mudaram."""
+    result = refresh_packets(**payload.model_dump())
+    return {"ok": True, **result}
+
+# ============================
+# Jobs (geração assíncrona)
+# POST enfileira e devolve job_id; GET /api/jobs/{id} mostra estado/progresso
+# ============================
+
+def _submit_job(request: Request, kind: str, fn, **kwargs):
+    try:
+        job = packet_jobs.submit(kind, fn, **kwargs)
+    except packet_jobs.JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=_cors_headers(request))
+    return {"ok": True, "job_id": job["job_id"], "job": job}
+
+
+@app.post("/api/jobs/generate")
+def api_job_generate(request: Request, payload: GeneratePayload):
+    return _submit_job(request, "generate", generate_packet_by_project, project_key=payload.project_key)
+
+
+@app.post("/api/jobs/generate-company")
+def api_job_generate_company(request: Request, payload: GenerateCompanyPayload):
+    return _submit_job(request, "generate-company", generate_packet_for_company, **payload.model_dump())
+
+
+@app.post("/api/jobs/download-project")
+def api_job_download_project(request: Request, payload: DownloadProjectPayload):
+    # job só renderiza; o ZIP sai em streaming no /download, direto do out_folder
+    return _submit_job(request, "download-project", generate_packet_by_project, project_key=payload.project_key)
+
+
+@app.post("/api/jobs/download-company")
+def api_job_download_company(request: Request, payload: DownloadCompanyPayload):
+    return _submit_job(request, "download-company", generate_packet_for_company, **payload.model_dump())
+
+
+@app.post("/api/jobs/refresh-packets")
+def api_job_refresh_packets(request: Request, payload: RefreshPacketsPayload):
+    return _submit_job(request, "refresh-packets", refresh_packets, **payload.model_dump())
+
+
+@app.get("/api/jobs/{job_id}")
+def api_job_status(request: Request, job_id: str):
+    job = packet_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job não encontrado: {job_id}", headers=_cors_headers(request))
+    return {"ok": True, "job": job}
+
+
+@app.get("/api/jobs/{job_id}/download")
+def api_job_download(request: Request, job_id: str):
+    job = packet_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job não encontrado: {job_id}", headers=_cors_headers(request))
+
+    result = job.get("result") or {}
+    if job["state"] != "done" or not result.get("generated"):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job sem PDFs para baixar (state={job['state']}).",
+            headers=_cors_headers(request),
+        )
+
+    params = job.get("params") or {}
+    safe_name = params.get("project_key") or params.get("city") or "packet"
+    # ✅ ZIP_STORED montado na hora a partir dos PDFs do packet (nada de cópia em _zips)
+    return _zip_stream_response(request, stream_zip_packet(result), f"{safe_name}.zip")
+
+
 # ============================
 # DATA
 # ============================
 
 
 @app.get("/api/data/{name}")
-def api_data(name: str):
-    data = load_data(name)
-    return {"ok": True, "data": data}
+def api_data(
+    name: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    company_key: Optional[str] = None,
+    city: Optional[str] = None,
+    prefix: Optional[str] = None,
+):
+    if not _wants_page(cursor, limit, fields, company_key, city, prefix):
+        data = load_data(name)
+        return {"ok": True, "data": data}
+    page = _page_or_400(
+        request, page_data, name,
+        cursor=cursor, limit=limit, fields=_split_fields(fields),
+        company_key=company_key, city=city, prefix=prefix,
+    )
+    return {"ok": True, **page}
 
 # ============================
 # ✅ TEMPLATES (blank + fields + layers)
@@ -288,16 +481,71 @@ def api_data(name: str):
 # ============================
 
 
+def _cached_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: str,
+    etag: str,
+    immutable: bool = False,
+):
+    """FileResponse com ETag/Last-Modified; 304 se o browser já tem essa versão."""
+    last_mod = http_cache.last_modified(path)
+    headers = {**_cors_headers(request), **http_cache.validator_headers(etag, last_mod, immutable)}
+    if http_cache.is_not_modified(request.headers, etag, last_mod):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
+
+
 @app.get("/api/template/{city}/{form_key}/blank.pdf")
-def api_template_blank(request: Request, city: str, form_key: str):
+def api_template_blank(request: Request, city: str, form_key: str, v: str | None = None):
     try:
         path = get_blank_pdf_path(city, form_key)
-        return FileResponse(
+        sha = get_template_manifest(city, form_key)["sha256"]
+        # ✅ ?v=<sha256 (prefixo)> → URL imutável (cache de 1 ano); sem v → revalida por ETag
+        immutable = bool(v) and len(v) >= 8 and sha.startswith(v)
+        return _cached_file_response(
+            request,
             path,
             media_type="application/pdf",
             filename="blank.pdf",
+            etag=http_cache.make_etag(sha),
+            immutable=immutable,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e),
             headers=_cors_headers(request),
         )
+
+
+@app.get("/api/template/{city}/{form_key}/pages/{spec}.pdf")
+def api_template_pages(request: Request, city: str, form_key: str, spec: str, v: str | None = None):
+    """
+    Só algumas páginas do blank (ex.: pages/1.pdf, pages/2-4.pdf) como PDF avulso.
+    O blank inteiro continua em blank.pdf (com suporte a Range para o PDF.js).
+    """
+    try:
+        first, _, last = spec.partition("-")
+        start = int(first)
+        end = int(last) if last else start
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Páginas inválidas: {spec} (use N ou N-M)",
+            headers=_cors_headers(request),
+        )
+
+    try:
+        content, sha = get_template_pages(city, form_key, start, end)
+    except PageRangeError as e:
+        # ✅ template existe, páginas não: 416 (+ total de páginas no Content-Range)
+        raise HTTPException(
+            status_code=416,
+            detail=str(e),
+            headers={**_cors_headers(request), "Content-Range": f"pages */{e.total}"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=404,
@@ -305,6 +553,17 @@ def api_template_blank(request: Request, city: str, form_key: str):
             headers=_cors_headers(request),
         )
 
+    etag = http_cache.make_etag(sha, f"{start}-{end}")
+    immutable = bool(v) and len(v) >= 8 and sha.startswith(v)
+    headers = {**_cors_headers(request), **http_cache.validator_headers(etag, None, immutable)}
+    if http_cache.is_not_modified(request.headers, etag, None):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content,
+        media_type="application/pdf",
+        headers={**headers, "Content-Disposition": f'inline; filename="{form_key}_p{start}-{end}.pdf"'},
+    )
+
 
 @app.get("/api/template/{city}/{form_key}/fields.json")
 def api_template_fields(
@@ -315,11 +574,13 @@ def api_template_fields(
 ):
     try:
         path = get_fields_json_path(city, form_key, company_key=company_key)
-        return FileResponse(
+        # ETag = arquivo resolvido (override da empresa ou base) + hash do conteúdo
+        return _cached_file_response(
+            request,
             path,
             media_type="application/json",
             filename="fields.json",
-            headers=_cors_headers(request),
+            etag=http_cache.make_etag(path, http_cache.file_sha256(path)),
         )
     except Exception as e:
         raise HTTPException(
@@ -338,15 +599,33 @@ def api_template_layers(
 ):
     try:
         path = get_layers_json_path(city, form_key, company_key=company_key)
-        return FileResponse(
+        return _cached_file_response(
+            request,
             path,
             media_type="application/json",
             filename="layers.json",
+            etag=http_cache.make_etag(path, http_cache.file_sha256(path)),
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e),
             headers=_cors_headers(request),
         )
+
+
+@app.get("/api/template/{city}/{form_key}/manifest.json")
+def api_template_manifest(request: Request, city: str, form_key: str):
+    try:
+        manifest = get_template_manifest(city, form_key)
     except Exception as e:
         raise HTTPException(
             status_code=404,
             detail=str(e),
             headers=_cors_headers(request),
         )
+    etag = http_cache.json_etag(manifest)
+    headers = {**_cors_headers(request), **http_cache.validator_headers(etag, None)}
+    if http_cache.is_not_modified(request.headers, etag, None):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(manifest, headers=headers)
@@ -1,5 +1,11 @@
 # app/config_store.py
 import os
+import time
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from app import metrics
+from app.log import get_logger
 
 APP_DIR = os.path.abspath(os.path.dirname(__file__))
 ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
@@ -8,6 +14,13 @@ ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
 DATA_DIR = os.path.join(ROOT_DIR, "data")
 OVERRIDES_DIR = os.path.join(DATA_DIR, "overrides")
 
+# de quanto em quanto tempo (s) o índice confere mtime das pastas
+TEMPLATE_INDEX_TTL = float(os.environ.get("PERMIT_TEMPLATE_INDEX_TTL", "5"))
+
+TEMPLATE_FILES = ("blank.pdf", "fields.json", "layers.json")
+
+log = get_logger("config_store")
+
 
 def _abs_dir(template_dir: str) -> str:
     """Garante que template_dir vira caminho absoluto."""
@@ -24,6 +37,187 @@ def _find_first(root_dir: str, filename: str) -> str | None:
     return None
 
 
+# ============================
+# Índice de templates (sem os.walk no request)
+# ============================
+
+class _BaseEntry:
+    """Arquivos resolvidos de um template_dir + mtime das pastas envolvidas."""
+    __slots__ = ("files", "dirs_sig", "checked_at")
+
+    def __init__(self, files: Dict[str, Optional[str]], dirs_sig: tuple):
+        self.files = files
+        self.dirs_sig = dirs_sig
+        self.checked_at = time.monotonic()
+
+
+class _OverrideEntry:
+    """Override de 1 (company, city, form): arquivos (ou None) + mtime das 3 pastas do caminho."""
+    __slots__ = ("files", "dirs_sig", "checked_at")
+
+    def __init__(self, files: Optional[Tuple[str, str]], dirs_sig: tuple):
+        self.files = files
+        self.dirs_sig = dirs_sig
+        self.checked_at = time.monotonic()
+
+
+_index_lock = threading.Lock()
+_base_index: Dict[str, _BaseEntry] = {}
+# (company, city, form_key) -> override daquele form (inclusive "não existe")
+_override_index: Dict[Tuple[str, str, str], _OverrideEntry] = {}
+
+
+def _dir_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _scan_template_dir(template_dir: str) -> _BaseEntry:
+    files: Dict[str, Optional[str]] = {}
+    for name in TEMPLATE_FILES:
+        path = os.path.join(template_dir, name)
+        # ✅ Se HVHZ estiver “aninhado” (subpasta), acha automaticamente
+        files[name] = path if os.path.isfile(path) else _find_first(template_dir, name)
+
+    # criar/remover/renomear arquivo muda o mtime da pasta que o contém
+    dirs = {template_dir} | {os.path.dirname(p) for p in files.values() if p}
+    return _BaseEntry(files, tuple(sorted((d, _dir_mtime(d)) for d in dirs)))
+
+
+def _base_entry(template_dir: str) -> _BaseEntry:
+    with _index_lock:
+        entry = _base_index.get(template_dir)
+
+    if entry is not None:
+        if time.monotonic() - entry.checked_at < TEMPLATE_INDEX_TTL:
+            metrics.inc("permit_template_index_total", result="hit")
+            return entry
+        if all(_dir_mtime(d) == m for d, m in entry.dirs_sig):
+            entry.checked_at = time.monotonic()
+            metrics.inc("permit_template_index_total", result="hit")
+            return entry
+
+    metrics.inc("permit_template_index_total", result="miss")
+    entry = _scan_template_dir(template_dir)
+    with _index_lock:
+        _base_index[template_dir] = entry
+    return entry
+
+
+def _override_dirs(company_key: str, city: str, form_key: str) -> Tuple[str, str, str]:
+    company_dir = os.path.join(OVERRIDES_DIR, company_key)
+    city_dir = os.path.join(company_dir, city)
+    return company_dir, city_dir, os.path.join(city_dir, form_key)
+
+
+def _scan_override(company_key: str, city: str, form_key: str) -> _OverrideEntry:
+    """
+    Só a pasta do override pedido. Criar a pasta muda o mtime da pasta-mãe;
+    criar/remover fields.json/layers.json muda o da própria pasta.
+    """
+    dirs = _override_dirs(company_key, city, form_key)
+    sig = tuple(_dir_mtime(d) for d in dirs)
+    form_dir = dirs[2]
+    fields_path = os.path.join(form_dir, "fields.json")
+    layers_path = os.path.join(form_dir, "layers.json")
+    files = (fields_path, layers_path) if os.path.isfile(fields_path) and os.path.isfile(layers_path) else None
+    return _OverrideEntry(files, sig)
+
+
+def _scan_overrides() -> Dict[Tuple[str, str, str], _OverrideEntry]:
+    """Árvore inteira data/overrides/<company>/<city>/<form>/ (só no warm do startup)."""
+    found: Dict[Tuple[str, str, str], _OverrideEntry] = {}
+
+    def subdirs(path: str):
+        try:
+            return [e for e in os.scandir(path) if e.is_dir()]
+        except OSError:
+            return []
+
+    for company in subdirs(OVERRIDES_DIR):
+        for city in subdirs(company.path):
+            for form in subdirs(city.path):
+                entry = _scan_override(company.name, city.name, form.name)
+                if entry.files:
+                    found[(company.name, city.name, form.name)] = entry
+    return found
+
+
+def _override_files(company_key: str, city: str, form_key: str) -> Optional[Tuple[str, str]]:
+    key = (company_key, city, form_key)
+    with _index_lock:
+        entry = _override_index.get(key)
+
+    # ⚠️ override apagado/renomeado dentro do TTL (ou com mtime igual): caminho velho daria
+    # um form sem fields, sem erro → confere os arquivos e, faltando um, refaz a varredura
+    if entry is not None and (entry.files is None or all(os.path.isfile(p) for p in entry.files)):
+        if time.monotonic() - entry.checked_at < TEMPLATE_INDEX_TTL:
+            return entry.files
+        # TTL venceu: 3 stats (sem varrer a árvore) pegam override importado por outro processo
+        if tuple(_dir_mtime(d) for d in _override_dirs(*key)) == entry.dirs_sig:
+            entry.checked_at = time.monotonic()
+            return entry.files
+
+    entry = _scan_override(*key)
+    with _index_lock:
+        _override_index[key] = entry
+    return entry.files
+
+
+def warm_index(template_dirs: Iterable[str]):
+    """Monta o índice inteiro (startup): catálogo + árvore de overrides."""
+    t0 = time.perf_counter()
+    entries = {}
+    for tdir in template_dirs:
+        tdir = _abs_dir(tdir)
+        entries[tdir] = _scan_template_dir(tdir)
+    overrides = _scan_overrides()
+
+    with _index_lock:
+        _base_index.update(entries)
+        _override_index.update(overrides)
+
+    log.info(
+        "índice de templates pronto",
+        extra={"fields": {"templates": len(entries), "overrides": len(overrides), "ms": round((time.perf_counter() - t0) * 1000, 1)}},
+    )
+
+
+def invalidate_index(template_dir: Optional[str] = None):
+    """Descarta o índice (chamar depois de salvar override/template)."""
+    with _index_lock:
+        if template_dir is None:
+            _base_index.clear()
+        else:
+            _base_index.pop(_abs_dir(template_dir), None)
+        _override_index.clear()
+
+
+def lookup_form_files(
+    template_dir: str,
+    company_key: str | None,
+    city: str,
+    form_key: str,
+) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Igual resolve_form_files, mas via índice e com None para arquivo inexistente.
+    Prioridade: 1) override da empresa  2) template base
+    """
+    files = _base_entry(_abs_dir(template_dir)).files
+    blank_pdf = files["blank.pdf"]
+
+    if company_key:
+        override = _override_files(company_key, city, form_key)
+        if override:
+            log.debug("usando override", extra={"fields": {"company": company_key, "city": city, "form_key": form_key}})
+            return blank_pdf, override[0], override[1]
+
+    log.debug("usando template base", extra={"fields": {"city": city, "form_key": form_key}})
+    return blank_pdf, files["fields.json"], files["layers.json"]
+
+
 def resolve_form_files(
     template_dir: str,
     company_key: str | None,
@@ -35,40 +229,12 @@ def resolve_form_files(
     Prioridade:
     1) override da empresa
     2) template base
+    Arquivo inexistente volta no caminho da raiz do template_dir (como antes).
     """
-
     template_dir = _abs_dir(template_dir)
-
-    # template base (raiz)
-    blank_pdf = os.path.join(template_dir, "blank.pdf")
-    base_fields = os.path.join(template_dir, "fields.json")
-    base_layers = os.path.join(template_dir, "layers.json")
-
-    # ✅ Se HVHZ estiver “aninhado” (subpasta), acha automaticamente
-    if not os.path.exists(blank_pdf):
-        found = _find_first(template_dir, "blank.pdf")
-        if found:
-            blank_pdf = found
-
-    if not os.path.exists(base_fields):
-        found = _find_first(template_dir, "fields.json")
-        if found:
-            base_fields = found
-
-    if not os.path.exists(base_layers):
-        found = _find_first(template_dir, "layers.json")
-        if found:
-            base_layers = found
-
-    # override
-    if company_key:
-        override_dir = os.path.join(OVERRIDES_DIR, company_key, city, form_key)
-        override_fields = os.path.join(override_dir, "fields.json")
-        override_layers = os.path.join(override_dir, "layers.json")
-
-        if os.path.exists(override_fields) and os.path.exists(override_layers):
-            print(f"[OVERRIDE] usando override para {company_key}/{city}/{form_key}")
-            return blank_pdf, override_fields, override_layers
-
-    print(f"[TEMPLATE] usando template base para {city}/{form_key}")
-    return blank_pdf, base_fields, base_layers
+    blank_pdf, fields_path, layers_path = lookup_form_files(template_dir, company_key, city, form_key)
+    return (
+        blank_pdf or os.path.join(template_dir, "blank.pdf"),
+        fields_path or os.path.join(template_dir, "fields.json"),
+        layers_path or os.path.join(template_dir, "layers.json"),
+    )
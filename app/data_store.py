@@ -0,0 +1,388 @@
+# app/data_store.py
+import os
+import copy
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from app import sqlite_store
+from app.log import get_logger
+
+APP_DIR = os.path.abspath(os.path.dirname(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+
+# "json" (data/*.json, padrão) ou "sqlite" (data/permit.db — ver app/sqlite_store.py)
+STORAGE = os.environ.get("PERMIT_STORAGE", "json").lower()
+
+# journal: X.json.journal (1 linha JSON por escrita); compacta quando passa disso
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_COMPACT_BYTES = int(os.environ.get("PERMIT_JOURNAL_COMPACT_BYTES", str(256 * 1024)))
+
+# entidades conhecidas → arquivo em data/
+ENTITY_FILES = {
+    "projects": "projects.json",
+    "companies": "companies.json",
+    "jobs": "jobs.json",
+    "owners": "owners.json",
+    "roofs": "roofs.json",
+    "forms_catalog": "forms_catalog.json",
+}
+
+log = get_logger("data_store")
+
+
+class _Cached:
+    # signature = (snapshot, journal em compactação); offset = bytes do journal já aplicados
+    __slots__ = ("signature", "data", "offset")
+
+    def __init__(self, signature: tuple, data: Any, offset: int = 0):
+        self.signature = signature
+        self.data = data
+        self.offset = offset
+
+
+_lock = threading.Lock()
+_cache: Dict[str, _Cached] = {}
+
+# 1 lock de escrita por arquivo (append/compactação não se cruzam)
+_write_locks: Dict[str, threading.Lock] = {}
+
+
+def entity_path(name: str) -> str:
+    if name not in ENTITY_FILES:
+        raise ValueError(f"Entidade inválida: {name}")
+    return os.path.join(DATA_DIR, ENTITY_FILES[name])
+
+
+def _signature(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _journal_path(path: str) -> str:
+    return path + JOURNAL_SUFFIX
+
+
+def _compacting_path(path: str) -> str:
+    return path + JOURNAL_SUFFIX + ".compacting"
+
+
+def _write_lock(path: str) -> threading.Lock:
+    with _lock:
+        lk = _write_locks.get(path)
+        if lk is None:
+            lk = _write_locks[path] = threading.Lock()
+        return lk
+
+
+# ============================
+# Snapshot (arquivo .json) + journal
+# ============================
+
+def _read_snapshot(path: str) -> Any:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        txt = f.read().strip()
+    if not txt:
+        return {}
+    try:
+        return json.loads(txt)
+    except json.JSONDecodeError as e:
+        # ⚠️ não sobrescreve: arquivo corrompido precisa de conserto manual
+        raise ValueError(f"JSON inválido em {path}: {e}") from e
+
+
+def _read_tail(jpath: str, offset: int) -> bytes:
+    try:
+        with open(jpath, "rb") as f:
+            f.seek(offset)
+            return f.read()
+    except OSError:
+        return b""
+
+
+def _apply_ops(data: dict, raw: bytes, path: str) -> int:
+    """Aplica as linhas completas de `raw` em `data`. Retorna quantos bytes consumiu."""
+    end = raw.rfind(b"\n") + 1
+    for line in raw[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            op = json.loads(line)
+            key = op["key"]
+            if op["op"] == "put":
+                data[key] = op["value"]
+            elif op["op"] == "del":
+                data.pop(key, None)
+        except (ValueError, KeyError, TypeError):
+            # linha cortada por crash no meio de um append: ignora
+            log.warning("journal: linha inválida ignorada", extra={"fields": {"path": path, "line": line[:120]}})
+    return end
+
+
+def _rebuild(path: str) -> _Cached:
+    sig = (_signature(path), _signature(_compacting_path(path)))
+    data = _read_snapshot(path)
+
+    jpath = _journal_path(path)
+    cpath = _compacting_path(path)
+    if not isinstance(data, dict):
+        if os.path.exists(jpath) or os.path.exists(cpath):
+            log.warning("journal ignorado: snapshot não é dict", extra={"fields": {"path": path}})
+        return _Cached(sig, data, 0)
+
+    # journal em compactação (crash no meio) vem antes do journal atual
+    if os.path.exists(cpath):
+        _apply_ops(data, _read_tail(cpath, 0), cpath)
+    offset = _apply_ops(data, _read_tail(jpath, 0), jpath)
+    return _Cached(sig, data, offset)
+
+
+def load_json(path: str) -> Any:
+    """
+    Estado atual do arquivo (snapshot + journal), servido da memória.
+    Append no journal → aplica só o trecho novo; snapshot mudou → relê tudo.
+    ⚠️ O objeto devolvido é compartilhado — não altere (use load_json_copy).
+    """
+    path = os.path.abspath(path)
+    sig = (_signature(path), _signature(_compacting_path(path)))
+    jsig = _signature(_journal_path(path))
+    if sig == (None, None) and jsig is None:
+        return {}
+
+    with _lock:
+        cached = _cache.get(path)
+
+    if cached is not None and cached.signature == sig:
+        size = jsig[1] if jsig else 0
+        if size == cached.offset:
+            return cached.data
+        if size > cached.offset and isinstance(cached.data, dict):
+            # cópia rasa: quem já tem o dict antigo não vê ele mudar
+            data = dict(cached.data)
+            consumed = _apply_ops(data, _read_tail(_journal_path(path), cached.offset), path)
+            with _lock:
+                _cache[path] = _Cached(sig, data, cached.offset + consumed)
+            return data
+
+    fresh = _rebuild(path)
+    with _lock:
+        _cache[path] = fresh
+    return fresh.data
+
+
+def load_json_copy(path: str) -> Any:
+    return copy.deepcopy(load_json(path))
+
+
+def write_json_atomic(path: str, data: Any):
+    """Grava o arquivo inteiro via temp + fsync + rename (nunca fica pela metade)."""
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _append_ops(path: str, ops: List[Dict[str, Any]]):
+    """Append + fsync no journal: custo = tamanho dos registros, não do arquivo."""
+    jpath = _journal_path(path)
+    payload = b"".join(json.dumps(op, ensure_ascii=False).encode("utf-8") + b"\n" for op in ops)
+
+    os.makedirs(os.path.dirname(jpath), exist_ok=True)
+    with open(jpath, "ab") as f:
+        # crash deixou a última linha sem \n → fecha ela antes (senão a próxima se perde junto)
+        if f.tell() > 0:
+            with open(jpath, "rb") as r:
+                r.seek(-1, os.SEEK_END)
+                if r.read(1) != b"\n":
+                    payload = b"\n" + payload
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+
+    if size >= JOURNAL_COMPACT_BYTES:
+        _compact_locked(path)
+
+
+def _compact_locked(path: str):
+    jpath = _journal_path(path)
+    cpath = _compacting_path(path)
+
+    # 1) journal atual sai do caminho (appends de outro processo vão para um journal novo)
+    if os.path.exists(jpath) and not os.path.exists(cpath):
+        os.replace(jpath, cpath)
+
+    # 2) estado completo → snapshot atômico
+    write_json_atomic(path, _rebuild(path).data)
+
+    # 3) descarta o que já foi incorporado (cair antes daqui é ok: reaplicar é idempotente)
+    if os.path.exists(cpath):
+        os.remove(cpath)
+
+    with _lock:
+        _cache.pop(path, None)
+    log.debug("journal compactado", extra={"fields": {"path": path}})
+
+
+def compact(path: str):
+    """Reescreve o snapshot com o estado atual e descarta o journal."""
+    path = os.path.abspath(path)
+    with _write_lock(path):
+        if os.path.exists(_journal_path(path)) or os.path.exists(_compacting_path(path)):
+            _compact_locked(path)
+
+
+def compact_all():
+    if _use_sqlite():
+        return
+    for name in ENTITY_FILES:
+        try:
+            compact(entity_path(name))
+        except (OSError, ValueError):
+            log.exception("falha ao compactar journal", extra={"fields": {"entity": name}})
+
+
+def append_record(path: str, key: str, value: Any):
+    path = os.path.abspath(path)
+    with _write_lock(path):
+        _append_ops(path, [{"op": "put", "key": key, "value": value}])
+
+
+def delete_json_record(path: str, key: str):
+    path = os.path.abspath(path)
+    with _write_lock(path):
+        _append_ops(path, [{"op": "del", "key": key}])
+
+
+def save_json(path: str, data: Any):
+    """
+    Grava o dict inteiro: só as chaves que mudaram vão para o journal.
+    Não-dict (ou snapshot não-dict) → reescrita atômica do arquivo.
+    """
+    path = os.path.abspath(path)
+    with _write_lock(path):
+        current = load_json(path)
+
+        if isinstance(data, dict) and isinstance(current, dict):
+            ops: List[Dict[str, Any]] = [
+                {"op": "put", "key": k, "value": v}
+                for k, v in data.items()
+                if k not in current or current[k] != v
+            ]
+            ops += [{"op": "del", "key": k} for k in current if k not in data]
+            if ops:
+                _append_ops(path, ops)
+            return
+
+        write_json_atomic(path, data)
+        for p in (_journal_path(path), _compacting_path(path)):
+            if os.path.exists(p):
+                os.remove(p)
+        with _lock:
+            _cache.pop(path, None)
+
+
+def version(path: str) -> Optional[tuple]:
+    """Assinatura atual (snapshot + journal): muda quando o conteúdo muda."""
+    path = os.path.abspath(path)
+    sigs = (_signature(path), _signature(_compacting_path(path)), _signature(_journal_path(path)))
+    return None if sigs == (None, None, None) else sigs
+
+
+def invalidate(path: Optional[str] = None):
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(path), None)
+
+
+# ============================
+# Atalhos por entidade (json ou sqlite)
+# ============================
+
+def _use_sqlite() -> bool:
+    return STORAGE == "sqlite"
+
+
+def _load_sqlite(name: str) -> Any:
+    sig = ("sqlite", sqlite_store.kind_version(name))
+    key = f"sqlite:{name}"
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and cached.signature == sig:
+        return cached.data
+
+    data = sqlite_store.load_kind(name)
+    with _lock:
+        _cache[key] = _Cached(sig, data)
+    return data
+
+
+def load(name: str) -> Any:
+    entity_path(name)  # valida o nome
+    if _use_sqlite():
+        return _load_sqlite(name)
+    return load_json(entity_path(name))
+
+
+def load_copy(name: str) -> Any:
+    return copy.deepcopy(load(name))
+
+
+def save(name: str, data: Any):
+    entity_path(name)
+    if _use_sqlite():
+        if not isinstance(data, dict):
+            raise ValueError(f"{name}: esperado dict")
+        sqlite_store.replace_kind(name, data)
+        with _lock:
+            _cache.pop(f"sqlite:{name}", None)
+        return
+    save_json(entity_path(name), data)
+
+
+def get_record(name: str, key: str) -> Any:
+    """Um registro (ou None). No sqlite é 1 SELECT pela chave, sem carregar o resto."""
+    entity_path(name)
+    if _use_sqlite():
+        return sqlite_store.get_record(name, key)
+    data = load(name)
+    return data.get(key) if isinstance(data, dict) else None
+
+
+def upsert_record(name: str, key: str, value: Any):
+    """Grava um registro: 1 linha no sqlite, 1 append (fsync) no journal do json."""
+    entity_path(name)
+    if _use_sqlite():
+        sqlite_store.upsert_record(name, key, value)
+        return
+    append_record(entity_path(name), key, value)
+
+
+def delete_record(name: str, key: str):
+    entity_path(name)
+    if _use_sqlite():
+        sqlite_store.delete_record(name, key)
+        return
+    delete_json_record(entity_path(name), key)
+
+
+def entity_version(name: str) -> Optional[tuple]:
+    if _use_sqlite():
+        return ("sqlite", sqlite_store.kind_version(name))
+    return version(entity_path(name))
@@ -0,0 +1,117 @@
+# app/direct_writer.py
+from typing import Dict, List
+
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+
+# nomes próprios no /Font da página (não colidem com as fontes do blank)
+FONT_TEXT = "/PFHelv"
+FONT_CHECK = "/PFZapf"
+# ✔ na ZapfDingbats (a20)
+CHECK_GLYPH = b"4"
+
+
+def _num(v: float) -> str:
+    s = f"{v:.3f}".rstrip("0").rstrip(".")
+    return s if s not in ("", "-0") else "0"
+
+
+def _pdf_string(text: str) -> bytes:
+    # Helvetica padrão + WinAnsiEncoding (o que não existe em cp1252 vira "?")
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _text(font: str, size: float, x: float, y: float, raw: bytes) -> bytes:
+    return f"BT {font} {_num(size)} Tf {_num(x)} {_num(y)} Td ".encode("ascii") + raw + b" Tj ET\n"
+
+
+def content_for_ops(ops: list, values: dict) -> bytes:
+    """Operadores de conteúdo para as ops de uma página (mesmo resultado visual do _draw_ops)."""
+    out: List[bytes] = [b"q 0 g 0 G\n"]
+
+    for op in ops:
+        kind = op.kind
+
+        if kind == "field":
+            section_obj = values.get(op.section, {})
+            value = str(section_obj.get(op.field, "")) if isinstance(section_obj, dict) and op.field else ""
+            if value:
+                out.append(_text(FONT_TEXT, op.font_size, op.x, op.y, _pdf_string(value)))
+
+        elif kind == "line":
+            out.append(
+                f"{_num(op.width)} w {_num(op.x1)} {_num(op.y1)} m {_num(op.x2)} {_num(op.y2)} l S\n".encode("ascii")
+            )
+
+        elif kind == "check":
+            out.append(_text(FONT_CHECK, op.size, op.x, op.y, b"(" + CHECK_GLYPH + b")"))
+
+        elif kind == "text":
+            if op.text:
+                out.append(_text(FONT_TEXT, op.font_size, op.x, op.y, _pdf_string(op.text)))
+
+    out.append(b"Q\n")
+    return b"".join(out)
+
+
+class DirectCanvas:
+    """
+    Desenha direto nas páginas do writer: 1 content stream extra por página,
+    com o conteúdo original isolado em q/Q. As fontes (Helvetica/ZapfDingbats,
+    padrão do PDF, sem embed) são objetos únicos por documento.
+    """
+
+    def __init__(self, writer: PdfWriter):
+        self.writer = writer
+        self._fonts: Dict[str, object] = {}
+
+    def _font_refs(self) -> Dict[str, object]:
+        if not self._fonts:
+            for name, base, encoding in (
+                (FONT_TEXT, "/Helvetica", "/WinAnsiEncoding"),
+                (FONT_CHECK, "/ZapfDingbats", None),
+            ):
+                font = DictionaryObject({
+                    NameObject("/Type"): NameObject("/Font"),
+                    NameObject("/Subtype"): NameObject("/Type1"),
+                    NameObject("/BaseFont"): NameObject(base),
+                })
+                if encoding:
+                    font[NameObject("/Encoding")] = NameObject(encoding)
+                self._fonts[name] = self.writer._add_object(font)
+        return self._fonts
+
+    def _stream(self, data: bytes, compress: bool = False):
+        s = DecodedStreamObject()
+        s.set_data(data)
+        return self.writer._add_object(s.flate_encode() if compress else s)
+
+    def draw_page(self, page, ops: list, values: dict):
+        content = content_for_ops(ops, values)
+
+        # /Resources e /Font podem ser indiretos (compartilhados): só acrescenta nomes
+        resources = page.get("/Resources")
+        if resources is None:
+            resources = page[NameObject("/Resources")] = DictionaryObject()
+        resources = resources.get_object()
+        fonts = resources.get("/Font")
+        if fonts is None:
+            fonts = resources[NameObject("/Font")] = DictionaryObject()
+        fonts = fonts.get_object()
+        for name, ref in self._font_refs().items():
+            if name not in fonts:
+                fonts[NameObject(name)] = ref
+
+        existing = page.get("/Contents")
+        existing = existing.get_object() if existing is not None else None
+        if existing is None:
+            parts = []
+        elif isinstance(existing, ArrayObject):
+            parts = list(existing)
+        else:
+            parts = [page.raw_get("/Contents")]
+
+        page[NameObject("/Contents")] = ArrayObject(
+            [self._stream(b"q\n"), *parts, self._stream(b"\nQ\n" + content, compress=True)]
+        )
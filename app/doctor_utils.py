@@ -1,47 +1,91 @@
 # app/doctor_utils.py
-from typing import Dict, List
+from typing import Any, Dict, List
 
+from app.log import get_logger
 
-def flatten_keys(data: Dict, prefix="") -> set:
-    keys = set()
-    for k, v in data.items():
-        full = f"{prefix}.{k}" if prefix else k
-        if isinstance(v, dict):
-            keys |= flatten_keys(v, full)
-        else:
-            keys.add(full)
-    return keys
+log = get_logger("doctor")
 
 
-def validate_fields(fields: Dict, values: Dict):
-    print("\n[CHECK] Fields")
-    all_keys = flatten_keys(values)
+def validate_layers(layers: List, total_pages: int) -> List[str]:
+    """Retorna a lista de avisos (também vai pro log em DEBUG)."""
+    warnings = []
 
-    warnings = 0
-    for field_key in fields.keys():
-        if field_key not in all_keys:
-            print(f"⚠️  Field inexistente nos dados: {field_key}")
-            warnings += 1
+    for i, layer in enumerate(layers, start=1):
+        page = int(layer.get("page", 1))
+        ltype = layer.get("type")
+
+        if page < 1 or page > total_pages:
+            warnings.append(f"Layer #{i} aponta para página inválida: {page}")
 
-    if warnings == 0:
-        print("✅ Todos os fields são válidos.")
+        if ltype not in ("text", "check", "line"):
+            warnings.append(f"Layer #{i} tem tipo inválido: {ltype}")
 
+    for w in warnings:
+        log.debug(w)
+    return warnings
 
-def validate_layers(layers: List, total_pages: int):
-    print("\n[CHECK] Layers")
-    warnings = 0
 
-    for i, layer in enumerate(layers, start=1):
-        page = int(layer.get("page", 1))
-        ltype = layer.get("type")
+# seções que o render conhece (values["company"], values["job"], ...)
+KNOWN_SECTIONS = ("company", "job", "owner", "roof")
+
 
+def _issue(target: str, ref, message: str) -> Dict[str, Any]:
+    return {"target": target, "ref": ref, "message": message}
+
+
+def check_template(fields: Any, layers: Any, total_pages: int) -> Dict[str, Any]:
+    """
+    Validação estrutural de fields/layers (sem depender dos dados do job).
+    Retorna {"ok", "errors": [...], "warnings": [...]}; cada item é
+    {"target": "field"|"layer"|"template", "ref": key/índice, "message"}.
+    """
+    errors: List[Dict[str, Any]] = []
+    warnings: List[Dict[str, Any]] = []
+
+    if not isinstance(fields, dict):
+        errors.append(_issue("template", "fields", "fields.json deve ser um objeto (dict)"))
+        fields = {}
+    if not isinstance(layers, list):
+        errors.append(_issue("template", "layers", "layers.json deve ser uma lista"))
+        layers = []
+
+    for key, cfg in fields.items():
+        if not isinstance(cfg, dict):
+            errors.append(_issue("field", key, "config do field não é objeto"))
+            continue
+        try:
+            float(cfg["x"])
+            float(cfg["y"])
+            page = int(cfg.get("page", 1))
+        except (KeyError, TypeError, ValueError):
+            errors.append(_issue("field", key, "x/y/page ausentes ou inválidos"))
+            continue
         if page < 1 or page > total_pages:
-            print(f"⚠️  Layer #{i} aponta para página inválida: {page}")
-            warnings += 1
+            errors.append(_issue("field", key, f"página inválida: {page} (template tem {total_pages})"))
+
+        section, _, name = str(key).partition(".")
+        if not name or section not in KNOWN_SECTIONS:
+            warnings.append(_issue("field", key, f"fora das seções conhecidas ({', '.join(KNOWN_SECTIONS)})"))
 
+    for i, layer in enumerate(layers, start=1):
+        if not isinstance(layer, dict):
+            errors.append(_issue("layer", i, "layer não é objeto"))
+            continue
+
+        ltype = layer.get("type")
         if ltype not in ("text", "check", "line"):
-            print(f"⚠️  Layer #{i} tem tipo inválido: {ltype}")
-            warnings += 1
+            errors.append(_issue("layer", i, f"tipo inválido: {ltype}"))
+            continue
+
+        coords = ("x1", "y1", "x2", "y2") if ltype == "line" else ("x", "y")
+        try:
+            for c in coords:
+                float(layer[c])
+            page = int(layer.get("page", 1))
+        except (KeyError, TypeError, ValueError):
+            errors.append(_issue("layer", i, f"coordenadas ausentes ou inválidas ({'/'.join(coords)})"))
+            continue
+        if page < 1 or page > total_pages:
+            errors.append(_issue("layer", i, f"página inválida: {page} (template tem {total_pages})"))
 
-    if warnings == 0:
-        print("✅ Todas as layers são válidas.")
+    return {"ok": not errors, "errors": errors, "warnings": warnings}
@@ -0,0 +1,80 @@
+# app/http_cache.py
+import os
+import json
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+# URL versionada (?v=<hash>) nunca muda de conteúdo → cache longo no browser
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# sem versão: pode guardar, mas sempre revalida (If-None-Match → 304)
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_lock = threading.Lock()
+# path -> ((mtime_ns, size), sha256)
+_hashes: Dict[str, Tuple[tuple, str]] = {}
+
+
+def file_sha256(path: str) -> str:
+    """sha256 do arquivo, recalculado só quando mtime/size mudam."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    sig = (st.st_mtime_ns, st.st_size)
+
+    with _lock:
+        cached = _hashes.get(path)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _lock:
+        _hashes[path] = (sig, digest)
+    return digest
+
+
+def make_etag(*parts: str) -> str:
+    """ETag forte a partir de hashes/identificadores (ex.: origem + sha do conteúdo)."""
+    if len(parts) == 1:
+        return f'"{parts[0]}"'
+    return '"' + hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def json_etag(data) -> str:
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return make_etag(hashlib.sha256(raw).hexdigest())
+
+
+def last_modified(path: str) -> str:
+    return formatdate(os.stat(path).st_mtime, usegmt=True)
+
+
+def is_not_modified(headers, etag: str, last_mod: Optional[str]) -> bool:
+    """If-None-Match tem prioridade; If-Modified-Since só vale sem ele (RFC 9110)."""
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    ims = headers.get("if-modified-since")
+    if ims and last_mod:
+        try:
+            return parsedate_to_datetime(last_mod) <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(etag: str, last_mod: Optional[str], immutable: bool = False) -> Dict[str, str]:
+    out = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+    if last_mod:
+        out["Last-Modified"] = last_mod
+    return out
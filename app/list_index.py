@@ -0,0 +1,134 @@
+# app/list_index.py
+import json
+import base64
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# teto de itens por página (limit maior é cortado)
+MAX_PAGE_SIZE = 500
+
+
+class SortedIndex:
+    """
+    Linhas já ordenadas por (texto_minúsculo, chave) + facetas (valor → posições).
+    Montado 1x por versão dos dados; consulta = bisect + varredura curta.
+    """
+    __slots__ = ("version", "rows", "sort_keys", "facets")
+
+    def __init__(self, version: Any, items: Iterable[Tuple[tuple, Dict[str, Any], Dict[str, Iterable[str]]]]):
+        ordered = sorted(items, key=lambda it: it[0])
+        self.version = version
+        self.sort_keys: List[tuple] = [it[0] for it in ordered]
+        self.rows: List[Dict[str, Any]] = [it[1] for it in ordered]
+
+        # posições entram em ordem crescente → cada lista já nasce ordenada
+        self.facets: Dict[str, Dict[str, List[int]]] = {}
+        for pos, (_, _, facet_values) in enumerate(ordered):
+            for name, values in facet_values.items():
+                bucket = self.facets.setdefault(name, {})
+                for v in set(values):
+                    if v:
+                        bucket.setdefault(str(v), []).append(pos)
+
+
+_lock = threading.Lock()
+_indexes: Dict[str, SortedIndex] = {}
+
+
+def get_index(name: str, version: Any, build: Callable[[], Iterable]) -> SortedIndex:
+    """Índice `name` da versão atual; reconstrói só quando a versão muda."""
+    with _lock:
+        idx = _indexes.get(name)
+    if idx is not None and idx.version == version:
+        return idx
+
+    idx = SortedIndex(version, build())
+    with _lock:
+        _indexes[name] = idx
+    return idx
+
+
+def clear():
+    with _lock:
+        _indexes.clear()
+
+
+# ============================
+# Cursor (opaco para o front)
+# ============================
+
+def encode_cursor(sort_key: tuple) -> str:
+    raw = json.dumps(list(sort_key), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, arity: int = 2) -> tuple:
+    """Cursor → chave de ordenação; formato errado (mesmo base64/JSON válido) → ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("cursor inválido") from e
+    if not isinstance(value, list) or len(value) != arity or not all(isinstance(v, str) for v in value):
+        raise ValueError("cursor inválido")
+    return tuple(value)
+
+
+# ============================
+# Consulta
+# ============================
+
+def project_fields(row: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if not fields:
+        return row
+    return {f: row[f] for f in fields if f in row}
+
+
+def query(
+    idx: SortedIndex,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    prefix: Optional[str] = None,
+    facets: Optional[Dict[str, Optional[str]]] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Página de linhas (na ordem do índice) + cursor da próxima (None = acabou).
+    prefix: começo do texto de ordenação (nome); facets: {"company_key": "...", "city": "..."}.
+    """
+    keys = idx.sort_keys
+    prefix = (prefix or "").lower()
+    if limit is not None:
+        if int(limit) < 1:
+            raise ValueError("limit deve ser >= 1")
+        limit = min(int(limit), MAX_PAGE_SIZE)
+
+    start = bisect_left(keys, (prefix,)) if prefix else 0
+    if cursor:
+        start = max(start, bisect_right(keys, decode_cursor(cursor, len(keys[0]) if keys else 2)))
+
+    wanted = {k: str(v) for k, v in (facets or {}).items() if v}
+    if wanted:
+        lists = [idx.facets.get(k, {}).get(v, []) for k, v in wanted.items()]
+        lists.sort(key=len)
+        others = [set(lst) for lst in lists[1:]]
+        base = lists[0]
+        positions: Iterable[int] = (p for p in base[bisect_left(base, start):] if all(p in o for o in others))
+    else:
+        positions = range(start, len(keys))
+
+    items: List[Dict[str, Any]] = []
+    next_cursor = None
+    last_pos = -1
+    for pos in positions:
+        # ordem crescente: passou do prefixo, não volta mais
+        if prefix and not str(keys[pos][0]).startswith(prefix):
+            break
+        if limit is not None and len(items) == limit:
+            next_cursor = encode_cursor(keys[last_pos])
+            break
+        items.append(project_fields(idx.rows[pos], fields))
+        last_pos = pos
+
+    return items, next_cursor
@@ -0,0 +1,46 @@
+# app/log.py
+import os
+import sys
+import logging
+
+# abaixo de DEBUG: 1 linha por field/layer desenhado (desligado por padrão)
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+LOG_LEVEL = os.environ.get("PERMIT_LOG_LEVEL", "INFO").upper()
+
+ROOT_LOGGER = "permit"
+
+
+class _FieldsFormatter(logging.Formatter):
+    """Formata `extra={"fields": {...}}` como key=value no fim da linha."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v!r}" if isinstance(v, str) else f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def setup_logging(level: str | int | None = None):
+    """Configura o logger "permit" (idempotente). Nível: argumento > PERMIT_LOG_LEVEL > INFO."""
+    root = logging.getLogger(ROOT_LOGGER)
+    level = level if level is not None else LOG_LEVEL
+    if isinstance(level, str):
+        level = TRACE if level == "TRACE" else logging.getLevelName(level)
+        if not isinstance(level, int):
+            level = logging.INFO
+    root.setLevel(level)
+
+    if not any(getattr(h, "_permit_handler", False) for h in root.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(_FieldsFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handler._permit_handler = True  # type: ignore[attr-defined]
+        root.addHandler(handler)
+        # não duplica no logger raiz (uvicorn tem o dele)
+        root.propagate = False
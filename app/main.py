@@ -1,4 +1,6 @@
+from app.log import setup_logging
 from app.menu import run_menu
 
 if __name__ == "__main__":
+    setup_logging()
     run_menu()
@@ -0,0 +1,146 @@
+# app/metrics.py
+import time
+import threading
+from contextlib import contextmanager
+
+# buckets (segundos) dos histogramas de estágio
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_METRIC = "permit_stage_seconds"
+
+_HELP = {
+    STAGE_METRIC: "Duração de cada estágio do pipeline de geração (segundos).",
+    "permit_template_cache_total": "Consultas ao cache de blank.pdf parseado, por resultado.",
+    "permit_page_cache_total": "Consultas ao cache de PDFs de página avulsa (editor), por resultado.",
+    "permit_plan_cache_total": "Consultas ao cache de templates compilados, por resultado.",
+    "permit_template_index_total": "Consultas ao índice de arquivos de template, por resultado.",
+    "permit_validation_total": "Conferências do carimbo de validação no render, por resultado.",
+    "permit_render_cache_total": "Consultas ao cache de PDFs renderizados (hit/miss/store).",
+    "permit_static_overlay_total": "Consultas ao cache de blank + overlay estático da company, por resultado.",
+    "permit_renders_total": "Forms renderizados com sucesso.",
+    "permit_render_failures_total": "Forms que falharam no render.",
+}
+
+_lock = threading.Lock()
+# name -> {labels_tuple: [bucket_counts..., sum, count]}
+_histograms: dict = {}
+# name -> {labels_tuple: valor}
+_counters: dict = {}
+
+# captura (worker do process pool): amostras vão pra uma lista e voltam pro processo principal
+_local = threading.local()
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _observe_locked(name: str, key: tuple, value: float):
+    series = _histograms.setdefault(name, {})
+    h = series.get(key)
+    if h is None:
+        h = series[key] = [0] * len(DEFAULT_BUCKETS) + [0.0, 0]
+    for i, bound in enumerate(DEFAULT_BUCKETS):
+        if value <= bound:
+            h[i] += 1
+    h[-2] += value
+    h[-1] += 1
+
+
+def observe(name: str, value: float, **labels):
+    key = _labels_key(labels)
+    samples = getattr(_local, "samples", None)
+    if samples is not None:
+        samples.append(("h", name, key, value))
+        return
+    with _lock:
+        _observe_locked(name, key, value)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _labels_key(labels)
+    samples = getattr(_local, "samples", None)
+    if samples is not None:
+        samples.append(("c", name, key, amount))
+        return
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+@contextmanager
+def timer(stage: str, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(STAGE_METRIC, time.perf_counter() - t0, stage=stage, **labels)
+
+
+@contextmanager
+def capture():
+    """Desvia as métricas da thread atual para uma lista (para replay() em outro processo)."""
+    samples: list = []
+    prev = getattr(_local, "samples", None)
+    _local.samples = samples
+    try:
+        yield samples
+    finally:
+        _local.samples = prev
+
+
+def replay(samples: list):
+    with _lock:
+        for kind, name, key, value in samples:
+            if kind == "h":
+                _observe_locked(name, key, value)
+            else:
+                series = _counters.setdefault(name, {})
+                series[key] = series.get(key, 0) + value
+
+
+# ============================
+# Prometheus text format
+# ============================
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    parts = []
+    for k, v in items:
+        v = v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        for name in sorted(_histograms):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(_histograms[name].items()):
+                for i, bound in enumerate(DEFAULT_BUCKETS):
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', repr(bound)),))} {h[i]}")
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {h[-1]}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {_fmt_value(h[-2])}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {h[-1]}")
+
+        for name in sorted(_counters):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, v in sorted(_counters[name].items()):
+                lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(v)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,84 @@
+# app/packet_deps.py
+import os
+import json
+import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from app import data_store, render_cache
+from app.pdf_engine import OVERLAY_MODE, PDF_ENGINE
+from app.render_plan import get_compiled_template
+
+# registro de dependências de cada packet: OUTPUT_DIR/_packets/<pasta do packet>.json
+# (fora da pasta do packet → não entra no ZIP nem na listagem dos PDFs)
+PACKETS_DIRNAME = "_packets"
+PACKET_VERSION = 1
+
+
+def record_path(output_dir: str, out_folder: str) -> str:
+    return os.path.join(output_dir, PACKETS_DIRNAME, os.path.basename(os.path.abspath(out_folder)) + ".json")
+
+
+def form_reads(plan) -> List[str]:
+    """section.field que o form lê: chaves do fields.json + `key` de layers (quando houver)."""
+    reads = set(plan.field_keys)
+    for layer in plan.layers:
+        if isinstance(layer, dict) and isinstance(layer.get("key"), str) and "." in layer["key"]:
+            reads.add(layer["key"])
+    return sorted(reads)
+
+
+def form_entry(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Dependências de 1 form: o que ele lê, com que valores, e a chave do render (template + valores)."""
+    plan = get_compiled_template(task["blank_pdf"], task["fields_path"], task["layers_path"])
+    values = task["values"]
+    reads = form_reads(plan)
+
+    return {
+        "city": task["city"],
+        "form_key": task["form_key"],
+        "file": os.path.basename(task["out_path"]),
+        "reads": reads,
+        # mesma extração do render_key → registro e cache não divergem
+        "values": render_cache.values_slice(plan, values, keys=reads),
+        "render_key": render_cache.render_key(
+            task["blank_pdf"], plan, values, OVERLAY_MODE, fill=task.get("fill"), engine=PDF_ENGINE
+        ),
+    }
+
+
+def changed_reads(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> List[str]:
+    """Quais section.field mudaram de valor desde o último render (vazio = só template mudou)."""
+    old_values = (old or {}).get("values") or {}
+    return sorted(k for k, v in new["values"].items() if old_values.get(k) != v)
+
+
+def write_record(output_dir: str, out_folder: str, source: Dict[str, Any], forms: List[Dict[str, Any]]):
+    data_store.write_json_atomic(
+        record_path(output_dir, out_folder),
+        {
+            "version": PACKET_VERSION,
+            "out_folder": os.path.basename(os.path.abspath(out_folder)),
+            "source": source,
+            "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "forms": forms,
+        },
+    )
+
+
+def iter_records(output_dir: str) -> Iterator[Dict[str, Any]]:
+    """Registros válidos cuja pasta de packet ainda existe."""
+    rdir = os.path.join(output_dir, PACKETS_DIRNAME)
+    if not os.path.isdir(rdir):
+        return
+    for name in sorted(os.listdir(rdir)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(rdir, name), "r", encoding="utf-8") as f:
+                rec = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(rec, dict) or rec.get("version") != PACKET_VERSION:
+            continue
+        if os.path.isdir(os.path.join(output_dir, str(rec.get("out_folder")))):
+            yield rec
@@ -0,0 +1,149 @@
+# app/packet_jobs.py
+import os
+import uuid
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.log import get_logger
+
+# quantos packets geram ao mesmo tempo (fora das requests)
+JOB_WORKERS = int(os.environ.get("PERMIT_JOB_WORKERS", "2"))
+# limite de jobs esperando na fila (acima disso o submit recusa)
+JOB_MAX_PENDING = int(os.environ.get("PERMIT_JOB_MAX_PENDING", "50"))
+# quantos jobs terminados ficam guardados para consulta
+JOB_HISTORY = int(os.environ.get("PERMIT_JOB_HISTORY", "200"))
+
+
+log = get_logger("jobs")
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="packet-job")
+    return _executor
+
+
+def _prune_locked():
+    finished = [jid for jid, j in _jobs.items() if j["state"] in ("done", "failed")]
+    while len(finished) > JOB_HISTORY:
+        _jobs.pop(finished.pop(0), None)
+
+
+def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **job,
+        "params": dict(job["params"]),
+        "progress": {
+            **job["progress"],
+            "forms": [dict(f) for f in job["progress"]["forms"]],
+        },
+        "result": dict(job["result"]) if job["result"] else None,
+    }
+
+
+def _on_progress(job_id: str, event: Dict[str, Any]):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        progress = job["progress"]
+
+        if event.get("type") == "planned":
+            progress["forms"] = [
+                {"city": f["city"], "form_key": f["form_key"], "state": "pending", "error": None, "out_path": None}
+                for f in event.get("forms", [])
+            ]
+            progress["total"] = len(progress["forms"])
+            progress["done"] = 0
+            return
+
+        if event.get("type") == "form":
+            for f in progress["forms"]:
+                if f["state"] == "pending" and f["city"] == event.get("city") and f["form_key"] == event.get("form_key"):
+                    f["state"] = "failed" if event.get("error") else "done"
+                    f["error"] = event.get("error")
+                    f["out_path"] = event.get("out_path")
+                    break
+            progress["done"] += 1
+
+
+def _run(job_id: str, fn: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any]):
+    with _lock:
+        job = _jobs[job_id]
+        job["state"] = "running"
+        job["started_at"] = _now()
+
+    try:
+        result = fn(on_progress=lambda ev: _on_progress(job_id, ev), **kwargs)
+        with _lock:
+            job["state"] = "done"
+            job["result"] = result if isinstance(result, dict) else {"value": result}
+    except Exception as e:
+        log.exception("job falhou", extra={"fields": {"job_id": job_id, "kind": job["kind"]}})
+        with _lock:
+            job["state"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        with _lock:
+            job["finished_at"] = _now()
+            _prune_locked()
+
+
+def submit(kind: str, fn: Callable[..., Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+    """
+    Enfileira uma geração. `fn` precisa aceitar on_progress=... (funções do svc).
+    Retorna o snapshot do job (com job_id).
+    """
+    with _lock:
+        pending = sum(1 for j in _jobs.values() if j["state"] == "queued")
+        if pending >= JOB_MAX_PENDING:
+            raise JobQueueFull(f"Fila de geração cheia ({pending} jobs aguardando).")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "state": "queued",
+            "params": kwargs,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"total": None, "done": 0, "forms": []},
+            "result": None,
+            "error": None,
+        }
+        _jobs[job_id] = job
+        snap = _snapshot(job)
+
+    _get_executor().submit(_run, job_id, fn, kwargs)
+    return snap
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        job = _jobs.get(job_id)
+        return _snapshot(job) if job else None
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,14 +1,23 @@
 # app/pdf_engine.py
+import io
 import os
 import json
+import hashlib
 import datetime
+import multiprocessing
 import platform
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from reportlab.pdfgen import canvas
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
 
 from app.config_store import resolve_form_files  # ✅ NOVO
-from app.doctor_utils import validate_fields, validate_layers  # 🧩 PASSO 2
+from app import data_store, direct_writer, metrics, render_cache, template_cache, template_manifest, template_validation
+from app.log import TRACE, get_logger
+from app.render_plan import get_compiled_template
 
 APP_DIR = os.path.abspath(os.path.dirname(__file__))                 # C:\permit-filler\app
 ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))              # C:\permit-filler
@@ -26,6 +35,21 @@ OWNERS_FILE = os.path.join(DATA_DIR, "owners.json")
 ROOFS_FILE = os.path.join(DATA_DIR, "roofs.json")
 FORMS_CATALOG_FILE = os.path.join(DATA_DIR, "forms_catalog.json")
 
+log = get_logger("pdf_engine")
+
+# "single" (um overlay multi-página por form) ou "per_page" (um overlay por página, modo antigo)
+OVERLAY_MODE = os.environ.get("PERMIT_OVERLAY_MODE", "single")
+
+# "reportlab" (padrão: overlay reportlab + merge do pypdf) ou "direct" (operadores PDF
+# escritos direto num content stream extra da página — app/direct_writer.py)
+PDF_ENGINE = os.environ.get("PERMIT_PDF_ENGINE", "reportlab").lower()
+
+# "1" (padrão): layers + company.* pré-aplicados no blank 1x por company/template; "0" desenha tudo por job
+STATIC_OVERLAY = os.environ.get("PERMIT_STATIC_OVERLAY", "1") != "0"
+
+# forms de um packet em paralelo: 0/1 = sequencial (padrão), N>1 = ProcessPoolExecutor com N workers
+RENDER_WORKERS = int(os.environ.get("PERMIT_RENDER_WORKERS", "0"))
+
 
 def _open_file(path: str):
     if platform.system() == "Windows":
@@ -36,151 +60,470 @@ def _open_file(path: str):
         os.system(f'xdg-open "{path}"')
 
 
-def _load_json(path: str):
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        content = f.read().strip()
-        if not content:
-            return {}
-        return json.loads(content)
-
-
-def _get_value(values: dict, key: str) -> str:
-    if "." not in key:
-        return ""
-    section, field = key.split(".", 1)
-    section_obj = values.get(section, {})
-    if not isinstance(section_obj, dict):
-        return ""
-    return str(section_obj.get(field, ""))
-
-
-def _draw_layers(c: canvas.Canvas, layers: list):
-    for layer in layers:
-        t = layer.get("type")
-        page = layer.get("page", "?")
-
-        if t == "line":
-            print(f"[LAYER] line (p={page})")
-            c.setLineWidth(layer.get("width", 1))
-            c.line(layer["x1"], layer["y1"], layer["x2"], layer["y2"])
-
-        elif t == "check":
-            print(f"[LAYER] check (p={page})")
-            if not layer.get("checked", True):
-                continue
-            c.setFont("Helvetica-Bold", layer.get("size", 12))
-            c.drawString(layer["x"], layer["y"], "✓")
-
-        elif t == "text":
-            print(f"[LAYER] text '{layer.get('value')}' (p={page})")
-            c.setFont("Helvetica", layer.get("font_size", 10))
-            c.drawString(layer["x"], layer["y"], layer.get("value", ""))
-
-
-    for layer in layers:
-        t = layer.get("type")
-        page = layer.get("page", "?")
-
-        if t == "line":
-            print(f"[LAYER] line (p={page})")
-            c.setLineWidth(layer.get("width", 1))
-            c.line(layer["x1"], layer["y1"], layer["x2"], layer["y2"])
-
-        elif t == "check":
-            print(f"[LAYER] check (p={page})")
-            c.setFont("Helvetica-Bold", layer.get("size", 12))
-            c.drawString(layer["x"], layer["y"], "✓")
-
-        elif t == "text":
-            print(f"[LAYER] text '{layer.get('value')}' (p={page})")
-            c.setFont("Helvetica", layer.get("font_size", 10))
-            c.drawString(layer["x"], layer["y"], layer.get("value", ""))
+def _draw_ops(c: canvas.Canvas, ops: list, values: dict, page_index: int):
+    # ✅ trace por field/layer: checado 1x por página; desligado = nenhuma formatação
+    trace = log.isEnabledFor(TRACE)
+
+    for op in ops:
+        kind = op.kind
+
+        if kind == "field":
+            section_obj = values.get(op.section, {})
+            value = str(section_obj.get(op.field, "")) if isinstance(section_obj, dict) and op.field else ""
+            if trace:
+                log.log(TRACE, "field", extra={"fields": {"key": op.key, "value": value, "page": page_index, "empty": value == ""}})
+
+            c.setFont("Helvetica", op.font_size)
+            c.drawString(op.x, op.y, value)
+
+        elif kind == "line":
+            if trace:
+                log.log(TRACE, "layer", extra={"fields": {"type": "line", "page": page_index}})
+            c.setLineWidth(op.width)
+            c.line(op.x1, op.y1, op.x2, op.y2)
+
+        elif kind == "check":
+            if trace:
+                log.log(TRACE, "layer", extra={"fields": {"type": "check", "page": page_index}})
+            c.setFont("Helvetica-Bold", op.size)
+            c.drawString(op.x, op.y, "✓")
+
+        elif kind == "text":
+            if trace:
+                log.log(TRACE, "layer", extra={"fields": {"type": "text", "value": op.text, "page": page_index}})
+            c.setFont("Helvetica", op.font_size)
+            c.drawString(op.x, op.y, op.text)
+
+
+def _page_size(page) -> tuple:
+    return (float(page.mediabox.width), float(page.mediabox.height))
+
+
+def _apply_overlay(writer: PdfWriter, pages: list, ops_for_page, values: dict, overlay_mode: str, labels: dict):
+    """
+    Desenha ops_for_page(n) sobre as páginas (cópias no writer) e faz o merge.
+    Páginas sem ops passam direto (sem overlay, sem merge, content stream original intacto).
+    """
+    drawn_pages = [page_index for page_index in range(1, len(pages) + 1) if ops_for_page(page_index)]
+
+    if drawn_pages and PDF_ENGINE == "direct":
+        # ✅ sem reportlab/parse/merge: só um content stream a mais por página
+        with metrics.timer("overlay_draw", **labels):
+            dc = direct_writer.DirectCanvas(writer)
+            for page_index in drawn_pages:
+                dc.draw_page(pages[page_index - 1], ops_for_page(page_index), values)
+    elif drawn_pages and overlay_mode == "per_page":
+        for page_index in drawn_pages:
+            page = pages[page_index - 1]
+            # ✅ overlay fica em memória (nada de _overlay_N.pdf no disco)
+            with metrics.timer("overlay_draw", **labels):
+                overlay_buf = io.BytesIO()
+
+                c = canvas.Canvas(overlay_buf, pagesize=_page_size(page))
+                _draw_ops(c, ops_for_page(page_index), values, page_index)
+                c.save()
+
+                overlay_buf.seek(0)
+                overlay = PdfReader(overlay_buf)
+
+            # ✅ FIX: overlay pode não ter páginas
+            if overlay.pages:
+                with metrics.timer("merge", **labels):
+                    page.merge_page(overlay.pages[0])
+    elif drawn_pages:
+        # ✅ um Canvas só: cada página desenhada vira uma página do overlay (mesmo mediabox)
+        with metrics.timer("overlay_draw", **labels):
+            overlay_buf = io.BytesIO()
+            c = canvas.Canvas(overlay_buf)
+
+            for page_index in drawn_pages:
+                c.setPageSize(_page_size(pages[page_index - 1]))
+                _draw_ops(c, ops_for_page(page_index), values, page_index)
+                c.showPage()
+
+            c.save()
+
+            overlay_buf.seek(0)
+            overlay = PdfReader(overlay_buf)
+
+        with metrics.timer("merge", **labels):
+            for overlay_index, page_index in enumerate(drawn_pages):
+                pages[page_index - 1].merge_page(overlay.pages[overlay_index])
+
+
+def _static_key(blank_pdf: str, plan, values: dict, overlay_mode: str) -> tuple:
+    """Versão do blank + versão do template + valores company.* que o form desenha."""
+    st = os.stat(blank_pdf)
+    company_values = render_cache.values_slice(plan, values, keys=plan.static_keys)
+    raw = json.dumps(company_values, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return (
+        "static",
+        os.path.abspath(blank_pdf),
+        (st.st_mtime_ns, st.st_size),
+        plan.fields_path,
+        plan.layers_path,
+        plan.signature,
+        PDF_ENGINE,
+        overlay_mode,
+        hashlib.sha256(raw.encode("utf-8")).hexdigest(),
+    )
 
 
-def _render_template_to_pdf(blank_pdf, fields_path, layers_path, values, out_path):
-    reader = PdfReader(blank_pdf)
-    writer = PdfWriter()
+def _add_static_pages(blank_pdf: str, plan, values: dict, overlay_mode: str, labels: dict, writer: PdfWriter) -> list:
+    """
+    Páginas do blank com layers + company.* já aplicados (gerado 1x por company/versão).
+    ⚠️ timers sem aninhar: o build (miss) registra template_parse/overlay_draw/merge do
+    próprio desenho + static_build; a cópia pro writer entra em template_parse.
+    """
+
+    def build() -> bytes:
+        with metrics.timer("template_parse", **labels):
+            base = PdfWriter()
+            pages = template_cache.add_template_pages(blank_pdf, base)
+        _apply_overlay(base, pages, plan.static_ops, values, overlay_mode, labels)
+        with metrics.timer("static_build", **labels):
+            # merge deixa o content stream descomprimido → comprime 1x aqui (não a cada job)
+            for page_index in plan.static_pages:
+                if 1 <= page_index <= len(pages):
+                    pages[page_index - 1].compress_content_streams()
+            buf = io.BytesIO()
+            base.write(buf)
+            return buf.getvalue()
+
+    entry = template_cache.get_derived(_static_key(blank_pdf, plan, values, overlay_mode), build)
+    with metrics.timer("template_parse", **labels):
+        return template_cache.add_derived_pages(entry, writer)
+
+
+def form_fill(form_meta: dict) -> dict | None:
+    """
+    Catálogo: "fill_mode": "acroform" (+ "acroform_map": {fields.json key: nome do campo},
+    "flatten": true) preenche os campos nativos do PDF. Padrão/"overlay" → None.
+    """
+    if form_meta.get("fill_mode") != "acroform":
+        return None
+    amap = form_meta.get("acroform_map")
+    return {
+        "mode": "acroform",
+        "acroform_map": amap if isinstance(amap, dict) else {},
+        "flatten": bool(form_meta.get("flatten", False)),
+    }
 
-    fields = _load_json(fields_path)
-    if not isinstance(fields, dict):
-        print(f"⚠️ fields.json inválido (esperado dict). type={type(fields)}")
-        fields = {}
 
-    layers = _load_json(layers_path)
+def acroform_mapping(blank_pdf: str, plan, fill: dict) -> dict:
+    """
+    fields.json key → nome do campo AcroForm: `acroform_name` no cfg do fields.json
+    ou `acroform_map` do catálogo. Só entram nomes que existem no blank (manifest).
+    """
+    known = set(template_manifest.get_manifest(blank_pdf).get("acroform_fields") or [])
+    amap = fill.get("acroform_map") or {}
+    out = {}
+    for key, cfg in plan.fields.items():
+        name = (cfg.get("acroform_name") if isinstance(cfg, dict) else None) or amap.get(key)
+        if name and name in known:
+            out[key] = name
+    return out
+
+
+def _fill_acroform(blank_pdf: str, plan, values: dict, fill: dict, overlay_mode: str, labels: dict) -> PdfWriter:
+    """
+    fill_mode "acroform": valores vão direto nos campos nativos do blank (sem overlay/merge).
+    flatten=True grava a aparência no conteúdo da página e remove os widgets.
+    Fields sem campo correspondente (e layers) continuam saindo pelo overlay.
+    """
+    mapped = acroform_mapping(blank_pdf, plan, fill)
+
+    with metrics.timer("template_parse", **labels):
+        writer = template_cache.clone_template(blank_pdf)
+
+    with metrics.timer("acroform_fill", **labels):
+        if mapped:
+            texts = render_cache.values_slice(plan, values, keys=list(mapped))
+            writer.update_page_form_field_values(
+                None,
+                {mapped[k]: texts[k] for k in mapped},
+                auto_regenerate=False,
+                flatten=bool(fill.get("flatten")),
+            )
+        if fill.get("flatten"):
+            writer.remove_annotations(subtypes="/Widget")
+            writer.root_object.pop(NameObject("/AcroForm"), None)
+        else:
+            # viewers regeneram a aparência com a fonte do próprio form
+            writer.set_need_appearances_writer(True)
+
+    filled = set(mapped)
+    _apply_overlay(
+        writer,
+        list(writer.pages),
+        lambda n: [op for op in plan.page_ops(n) if not (op.kind == "field" and op.key in filled)],
+        values,
+        overlay_mode,
+        labels,
+    )
+    return writer
+
+
+def render_template_bytes(
+    blank_pdf,
+    fields_path,
+    layers_path,
+    values,
+    overlay_mode: str | None = None,
+    labels: dict | None = None,
+    fill: dict | None = None,
+) -> bytes:
+    """
+    Renderiza o form inteiro em memória e devolve os bytes do PDF final.
+    `labels` (city/form_key/company) vão nos timers de /api/metrics.
+
+    overlay_mode:
+      - "single"   → um único documento reportlab com todas as páginas (showPage entre elas),
+                     parseado uma vez só e mesclado página a página (padrão)
+      - "per_page" → modo antigo: um Canvas + um PdfReader por página
+
+    Com STATIC_OVERLAY, layers + company.* vêm pré-aplicados (cache por company/template)
+    e por job só os fields de job/owner/roof são desenhados.
+
+    `fill` (do catálogo): {"mode": "acroform", "acroform_map": {...}, "flatten": bool}
+    preenche os campos nativos do PDF em vez de desenhar por coordenada.
+    """
+    overlay_mode = overlay_mode or OVERLAY_MODE
+    labels = labels or {}
+
+    # ✅ fields + layers compilados 1x (cache por mtime) → operações por página
+    with metrics.timer("compile", **labels):
+        plan = get_compiled_template(blank_pdf, fields_path, layers_path)
 
     # --- SANITY CHECK ---
-    validate_fields(fields, values)
-    validate_layers(layers, total_pages=len(reader.pages))
+    # ✅ validação roda no save; aqui só confere o carimbo (revalida se o arquivo mudou por fora)
+    template_validation.ensure_validated(blank_pdf, plan)
 
-    layers_by_page = {}
-    for ly in layers:
-        pg = int(ly.get("page", 1))
-        layers_by_page.setdefault(pg, []).append(ly)
-
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-
-    for page_index, page in enumerate(reader.pages, start=1):
-        overlay_path = f"{out_path}_overlay_{page_index}.pdf"
-
-        c = canvas.Canvas(
-            overlay_path,
-            pagesize=(float(page.mediabox.width), float(page.mediabox.height)),
-        )
+    if fill and fill.get("mode") == "acroform":
+        writer = _fill_acroform(blank_pdf, plan, values, fill, overlay_mode, labels)
+    else:
+        writer = PdfWriter()
+        # ✅ blank.pdf vem do cache (parse 1x por processo); páginas já são cópias do writer
+        if STATIC_OVERLAY and plan.static_pages:
+            # _add_static_pages mede os próprios estágios (build no miss ≠ template_parse)
+            pages = _add_static_pages(blank_pdf, plan, values, overlay_mode, labels, writer)
+            ops_for_page = plan.dynamic_ops
+        else:
+            with metrics.timer("template_parse", **labels):
+                pages = template_cache.add_template_pages(blank_pdf, writer)
+            ops_for_page = plan.page_ops
+
+        _apply_overlay(writer, pages, ops_for_page, values, overlay_mode, labels)
+
+    with metrics.timer("serialize", **labels):
+        out_buf = io.BytesIO()
+        writer.write(out_buf)
+        return out_buf.getvalue()
+
+
+def _render_template_to_pdf(
+    blank_pdf,
+    fields_path,
+    layers_path,
+    values,
+    out_path,
+    overlay_mode: str | None = None,
+    labels: dict | None = None,
+    fill: dict | None = None,
+    want_bytes: bool = False,
+) -> bytes | None:
+    """
+    Renderiza e grava em out_path (única escrita em disco do form).
+    Com want_bytes=True devolve os bytes gravados (ZIP em streaming); senão None.
+    ✅ render cache: mesmo blank + fields/layers + valores usados → reaproveita o PDF já gerado.
+    """
+    overlay_mode = overlay_mode or OVERLAY_MODE
+
+    key = None
+    if render_cache.RENDER_CACHE_ENABLED:
+        plan = get_compiled_template(blank_pdf, fields_path, layers_path)
+        key = render_cache.render_key(blank_pdf, plan, values, overlay_mode, fill=fill, engine=PDF_ENGINE)
+        if render_cache.fetch(key, out_path):
+            # ⚠️ hit: só relê o arquivo se quem chamou vai usar os bytes
+            if not want_bytes:
+                return None
+            with open(out_path, "rb") as f:
+                return f.read()
+
+    data = render_template_bytes(
+        blank_pdf, fields_path, layers_path, values, overlay_mode=overlay_mode, labels=labels, fill=fill
+    )
 
-        for key, cfg in (fields.items() if isinstance(fields, dict) else []):
-            # ✅ PATCH: se cfg não é dict, seu fields.json está no formato errado
-            if not isinstance(cfg, dict):
-                print(f"⚠️ [FIELDS] cfg inválido (não-dict) para key='{key}': {repr(cfg)[:120]}")
-                continue
+    with metrics.timer("write", **(labels or {})):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        # temp + rename: se out_path era hardlink do cache, o arquivo do cache não é sobrescrito
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out_path)
+
+    if key is not None:
+        render_cache.store(key, out_path)
+    return data if want_bytes else None
+
+
+# ============================
+# Render de vários forms (sequencial ou process pool)
+# ============================
+
+# workers -> pool; criado 1x e nunca desligado enquanto o processo serve requests
+_pools: dict = {}
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    ⚠️ spawn, não fork: a API é multithread e um filho forkado herdaria locks
+    (logging, template_cache, data_store, metrics) presos por outra thread.
+    Pool de outro tamanho vira um pool a mais; o antigo pode estar em uso.
+    Pool quebrado (worker morto → BrokenProcessPool em todo submit) é trocado por um novo.
+    """
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is not None and getattr(pool, "_broken", False):
+            log.warning("process pool quebrado, recriando", extra={"fields": {"workers": workers}})
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return pool
 
-            if int(cfg.get("page", 1)) != page_index:
-                continue
 
-            value = _get_value(values, key)
-            if value == "":
-                print(f"⚠️  Valor vazio para field: {key}")
+def _discard_pool(workers: int, pool: ProcessPoolExecutor):
+    with _pool_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
 
-            print(f"[FIELD] {key} → '{value}' (p={page_index})")
 
-            c.setFont("Helvetica", int(cfg.get("font_size", 10)))
-            c.drawString(
-                float(cfg["x"]),
-                float(cfg["y"]),
-                value,
+def _submit_all(workers: int, tasks: list):
+    """(pool, futures); pool quebrado/desligado no submit é trocado 1x, depois desiste → (None, None)."""
+    for _ in range(2):
+        pool = _get_pool(workers)
+        try:
+            return pool, [pool.submit(_render_task_in_worker, t) for t in tasks]
+        except (BrokenProcessPool, RuntimeError) as e:
+            log.warning("submit no process pool falhou", extra={"fields": {"workers": workers, "error": f"{type(e).__name__}: {e}"}})
+            _discard_pool(workers, pool)
+    return None, None
+
+
+def start_pool():
+    """Sobe o pool padrão (PERMIT_RENDER_WORKERS) no startup, fora do caminho das requests."""
+    if RENDER_WORKERS > 1:
+        _get_pool(RENDER_WORKERS)
+
+
+def shutdown_pools():
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_task(task: dict) -> dict:
+    """
+    task = {city, form_key, company_key, blank_pdf, fields_path, layers_path, values, out_path[, fill, return_bytes]}
+    Nunca levanta exceção: o erro volta no próprio resultado (por form).
+    Com return_bytes=True o resultado também traz o PDF em "pdf" (usado no ZIP em streaming).
+    """
+    result = {"city": task.get("city"), "form_key": task.get("form_key"), "out_path": task["out_path"], "error": None}
+    labels = {"city": task.get("city"), "form_key": task.get("form_key"), "company": task.get("company_key") or ""}
+    try:
+        with metrics.timer("render_total", **labels):
+            data = _render_template_to_pdf(
+                task["blank_pdf"],
+                task["fields_path"],
+                task["layers_path"],
+                task["values"],
+                task["out_path"],
+                labels=labels,
+                fill=task.get("fill"),
+                want_bytes=bool(task.get("return_bytes")),
             )
+        if task.get("return_bytes"):
+            result["pdf"] = data
+        metrics.inc("permit_renders_total", **labels)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        metrics.inc("permit_render_failures_total", **labels)
+        log.exception("render falhou", extra={"fields": labels})
+    return result
+
+
+def _render_task_in_worker(task: dict) -> tuple:
+    """Roda no process pool: devolve (resultado, métricas do worker) pro processo principal."""
+    with metrics.capture() as samples:
+        result = _render_task(task)
+    return result, samples
+
+
+def iter_render_forms(tasks: list, workers: int | None = None):
+    """
+    Renderiza os forms de um packet e vai entregando um resultado por task,
+    na mesma ordem das tasks, com `error` preenchido quando aquele form falhou.
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+
+    if workers <= 1 or len(tasks) <= 1:
+        for t in tasks:
+            yield _render_task(t)
+        return
 
-        _draw_layers(c, layers_by_page.get(page_index, []))
-        c.save()
-
-        overlay = PdfReader(overlay_path)
-
-        # ✅ FIX: overlay pode não ter páginas
-        if overlay.pages:
-            page.merge_page(overlay.pages[0])
-
-        writer.add_page(page)
+    pool, futures = _submit_all(workers, tasks)
+    if futures is None:
+        # ⚠️ sem pool utilizável: sequencial neste processo (mais lento, mas o packet sai)
+        for t in tasks:
+            yield _render_task(t)
+        return
 
+    for task, fut in zip(tasks, futures):
         try:
-            os.remove(overlay_path)
-        except PermissionError:
-            pass
+            result, samples = fut.result()
+            metrics.replay(samples)
+            yield result
+        except Exception as e:
+            # ex.: BrokenProcessPool (worker morreu no meio do form) → erro só deste form;
+            # o pool sai do cache pro próximo packet não herdar o pool quebrado
+            if isinstance(e, BrokenProcessPool):
+                _discard_pool(workers, pool)
+            metrics.inc(
+                "permit_render_failures_total",
+                city=task.get("city"),
+                form_key=task.get("form_key"),
+                company=task.get("company_key") or "",
+            )
+            yield {
+                "city": task.get("city"),
+                "form_key": task.get("form_key"),
+                "out_path": task["out_path"],
+                "error": f"{type(e).__name__}: {e}",
+            }
+
 
-    with open(out_path, "wb") as f:
-        writer.write(f)
+def render_forms(tasks: list, workers: int | None = None) -> list:
+    return list(iter_render_forms(tasks, workers=workers))
 
 
 def generate_pdf_for_project():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    projects = _load_json(PROJECTS_FILE)
+    projects = data_store.load("projects")
 
-    companies = _load_json(COMPANIES_FILE)
-    jobs = _load_json(JOBS_FILE)
-    owners = _load_json(OWNERS_FILE)
-    roofs = _load_json(ROOFS_FILE)
-    catalog = _load_json(FORMS_CATALOG_FILE)
+    companies = data_store.load("companies")
+    jobs = data_store.load("jobs")
+    owners = data_store.load("owners")
+    roofs = data_store.load("roofs")
+    catalog = data_store.load("forms_catalog")
 
     print("\n--- Gerar PACKET ---")
 
@@ -227,7 +570,7 @@ def generate_pdf_for_project():
     )
     os.makedirs(out_folder, exist_ok=True)
 
-    generated = []
+    tasks = []
 
     for item in forms:
         city = item.get("city")
@@ -253,18 +596,25 @@ def generate_pdf_for_project():
             print(f"⚠️ blank.pdf não encontrado para {city}/{form_key}")
             continue
 
-        out_path = os.path.join(out_folder, f"{city}__{form_key}.pdf")
-
-        _render_template_to_pdf(
-            blank_pdf,
-            fields_path,
-            layers_path,
-            values,
-            out_path,
-        )
+        tasks.append({
+            "city": city,
+            "form_key": form_key,
+            "company_key": company_key,
+            "blank_pdf": blank_pdf,
+            "fields_path": fields_path,
+            "layers_path": layers_path,
+            "values": values,
+            "out_path": os.path.join(out_folder, f"{city}__{form_key}.pdf"),
+            "fill": form_fill(form_meta),
+        })
 
-        generated.append(out_path)
-        print(f"✅ Gerado: {os.path.basename(out_path)}")
+    generated = []
+    for res in render_forms(tasks):
+        if res["error"]:
+            print(f"❌ Falhou: {res['city']}/{res['form_key']} → {res['error']}")
+            continue
+        generated.append(res["out_path"])
+        print(f"✅ Gerado: {os.path.basename(res['out_path'])}")
 
     if generated:
         print(f"\n✅ PACKET gerado em: {out_folder}")
@@ -2,6 +2,8 @@ import os
 import json
 import shutil
 
+from app import data_store
+
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
@@ -33,46 +35,44 @@ def ensure_files():
 
 def load_json(path: str):
     ensure_files()
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except (json.JSONDecodeError, OSError):
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({}, f, indent=2, ensure_ascii=False)
-        return {}
+    # ✅ lê via data_store (snapshot + journal); cópia porque o menu altera o dict
+    # ⚠️ arquivo corrompido → ValueError (antes era trocado por {} e os dados sumiam)
+    return data_store.load_json_copy(path)
 
 
 def save_json(path: str, data: dict):
     ensure_files()
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    data_store.save_json(path, data)
+
+
+def load_entity(name: str):
+    """Entidade via data_store (json ou sqlite). Cópia: o menu altera o dict."""
+    ensure_files()
+    return data_store.load_copy(name)
 
 
 def load_projects():
-    return load_json(PROJECTS_FILE)
+    return load_entity("projects")
 
 
 def load_companies():
-    return load_json(COMPANIES_FILE)
+    return load_entity("companies")
 
 
 def load_jobs():
-    return load_json(JOBS_FILE)
+    return load_entity("jobs")
 
 
 def load_owners():
-    return load_json(OWNERS_FILE)
+    return load_entity("owners")
 
 
 def load_roofs():
-    return load_json(ROOFS_FILE)
+    return load_entity("roofs")
 
 
 def load_forms_catalog():
-    return load_json(FORMS_CATALOG_FILE)
+    return load_entity("forms_catalog")
 
 
 def _choose_from_dict(title: str, data: dict):
@@ -177,7 +177,7 @@ def create_project():
         "roof_key": None,
         "forms": forms
     }
-    save_json(PROJECTS_FILE, projects)
+    data_store.upsert_record("projects", project_key, projects[project_key])
     print("\n✅ Projeto PACKET criado com sucesso.")
 
 
@@ -218,7 +218,7 @@ def set_project_company():
         return
 
     projects[project_key]["company_key"] = company_key
-    save_json(PROJECTS_FILE, projects)
+    data_store.upsert_record("projects", project_key, projects[project_key])
     print("✅ Empresa vinculada ao projeto.")
 
 
@@ -235,7 +235,7 @@ def set_project_job():
         return
 
     projects[project_key]["job_key"] = job_key
-    save_json(PROJECTS_FILE, projects)
+    data_store.upsert_record("projects", project_key, projects[project_key])
     print("✅ Job vinculado ao projeto.")
 
 
@@ -252,7 +252,7 @@ def set_project_owner():
         return
 
     projects[project_key]["owner_key"] = owner_key
-    save_json(PROJECTS_FILE, projects)
+    data_store.upsert_record("projects", project_key, projects[project_key])
     print("✅ Owner vinculado ao projeto.")
 
 
@@ -269,7 +269,7 @@ def set_project_roof():
         return
 
     projects[project_key]["roof_key"] = roof_key
-    save_json(PROJECTS_FILE, projects)
+    data_store.upsert_record("projects", project_key, projects[project_key])
     print("✅ Roof preset vinculado ao projeto.")
 
 
@@ -300,5 +300,5 @@ def create_company():
         "email": email
     }
 
-    save_json(COMPANIES_FILE, companies)
+    data_store.upsert_record("companies", key, companies[key])
     print("✅ Empresa criada com sucesso.")
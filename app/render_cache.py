@@ -0,0 +1,200 @@
+# app/render_cache.py
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from app import metrics, template_manifest
+from app.log import get_logger
+
+APP_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# PDFs renderizados, endereçados pelo hash das entradas (blank + fields/layers + valores usados)
+RENDER_CACHE_DIR = os.environ.get("PERMIT_RENDER_CACHE_DIR", os.path.join(APP_DIR, "output", "render_cache"))
+# "0" desliga (sempre renderiza)
+RENDER_CACHE_ENABLED = os.environ.get("PERMIT_RENDER_CACHE", "1") != "0"
+# teto em disco; store() chama prune() quando passa do teto (apaga os menos usados)
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("PERMIT_RENDER_CACHE_BYTES", str(1024 * 1024 * 1024)))
+# prune desce até essa fração do teto (senão todo store logo acima do teto varreria o cache)
+PRUNE_TARGET = 0.9
+
+# ⚠️ o PDF do cache é hardlink do PDF do packet (mesmo inode): tocar o mtime dele mudaria
+# o do arquivo entregue. O último uso fica num sidecar vazio ao lado (<key>.pdf.used).
+USED_SUFFIX = ".used"
+
+# ⚠️ incrementar quando o desenho do overlay mudar (invalida tudo que já está no cache)
+CACHE_FORMAT = 1
+
+log = get_logger("render_cache")
+
+_lock = threading.Lock()
+# (fields_path, layers_path, assinatura do plano) -> sha256 do conteúdo de fields/layers
+_template_hashes: Dict[tuple, str] = {}
+# bytes em disco estimados por este processo (None = ainda não varreu)
+_cache_bytes: Optional[int] = None
+
+
+def _template_hash(plan) -> str:
+    key = (plan.fields_path, plan.layers_path, plan.signature)
+    with _lock:
+        h = _template_hashes.get(key)
+    if h is not None:
+        return h
+
+    raw = json.dumps([plan.fields, plan.layers], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    h = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    with _lock:
+        _template_hashes[key] = h
+    return h
+
+
+def values_slice(plan, values: dict, keys=None) -> Dict[str, str]:
+    """Só os section.field que o form desenha (ou `keys`), já como texto (igual ao _draw_ops)."""
+    out: Dict[str, str] = {}
+    for key in plan.field_keys if keys is None else keys:
+        section, _, field = key.partition(".")
+        section_obj = values.get(section, {})
+        out[key] = str(section_obj.get(field, "")) if isinstance(section_obj, dict) and field else ""
+    return out
+
+
+def render_key(
+    blank_pdf: str,
+    plan,
+    values: dict,
+    overlay_mode: str,
+    fill: Optional[dict] = None,
+    engine: str = "reportlab",
+) -> str:
+    parts = [
+        CACHE_FORMAT,
+        template_manifest.get_manifest(blank_pdf)["sha256"],
+        _template_hash(plan),
+        engine,
+        overlay_mode,
+        fill or None,
+        values_slice(plan, values),
+    ]
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_path(key: str) -> str:
+    return os.path.join(RENDER_CACHE_DIR, key[:2], key + ".pdf")
+
+
+def _link_or_copy(src: str, dst: str):
+    """Hardlink quando dá (mesmo disco); senão cópia. Sempre via temp + rename."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _mark_used(path: str):
+    """LRU do prune: toca o sidecar (inode próprio), nunca o PDF."""
+    try:
+        with open(path + USED_SUFFIX, "ab"):
+            pass
+        os.utime(path + USED_SUFFIX)
+    except OSError:
+        pass
+
+
+def fetch(key: str, out_path: str) -> bool:
+    """Hit → coloca o PDF do cache em out_path e devolve True."""
+    src = cache_path(key)
+    try:
+        _link_or_copy(src, out_path)
+    except FileNotFoundError:
+        metrics.inc("permit_render_cache_total", result="miss")
+        return False
+
+    _mark_used(src)
+    metrics.inc("permit_render_cache_total", result="hit")
+    return True
+
+
+def store(key: str, out_path: str):
+    """Guarda o PDF recém-gravado em out_path (falha aqui nunca derruba o render)."""
+    global _cache_bytes
+    try:
+        _link_or_copy(out_path, cache_path(key))
+        metrics.inc("permit_render_cache_total", result="store")
+        size = os.path.getsize(out_path)
+    except OSError:
+        log.warning("não foi possível gravar no render cache", extra={"fields": {"key": key}})
+        return
+
+    with _lock:
+        if _cache_bytes is not None:
+            _cache_bytes += size
+        over = _cache_bytes is None or _cache_bytes > RENDER_CACHE_MAX_BYTES
+    if over:
+        # 1ª vez no processo: prune() também serve de varredura inicial do tamanho
+        prune()
+
+
+def prune(max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Passou de max_bytes → apaga os PDFs menos usados até PRUNE_TARGET do teto."""
+    global _cache_bytes
+    max_bytes = RENDER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries: Dict[str, list] = {}  # pdf -> [último uso, tamanho]
+    used: Dict[str, float] = {}
+    total = 0
+    for dirpath, _, names in os.walk(RENDER_CACHE_DIR):
+        for n in names:
+            p = os.path.join(dirpath, n)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            if n.endswith(USED_SUFFIX):
+                used[p[: -len(USED_SUFFIX)]] = st.st_mtime
+            elif n.endswith(".pdf"):
+                entries[p] = [st.st_mtime, st.st_size]
+                total += st.st_size
+
+    # sidecar sem PDF (apagado por fora) não conta como entrada
+    for p in used.keys() - entries.keys():
+        try:
+            os.remove(p + USED_SUFFIX)
+        except OSError:
+            pass
+
+    removed = 0
+    if total > max_bytes:
+        target = int(max_bytes * PRUNE_TARGET)
+        for p, (mtime, size) in sorted(entries.items(), key=lambda it: max(it[1][0], used.get(it[0], 0.0))):
+            if total <= target:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            try:
+                os.remove(p + USED_SUFFIX)
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+
+    with _lock:
+        _cache_bytes = total
+    if removed:
+        log.info("render cache podado", extra={"fields": {"removed": removed, "bytes": total}})
+    return {"files": len(entries) - removed, "bytes": total, "removed": removed}
+
+
+def clear():
+    with _lock:
+        _template_hashes.clear()
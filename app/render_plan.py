@@ -0,0 +1,245 @@
+# app/render_plan.py
+import os
+import json
+import threading
+
+from app import metrics
+from app.log import get_logger
+
+log = get_logger("render_plan")
+
+# seções iguais em todo job de uma company → parte estática do overlay (junto com as layers)
+STATIC_SECTIONS = ("company",)
+
+
+# ============================
+# Operações de desenho (compactas)
+# ============================
+
+class FieldOp:
+    """Texto vindo dos dados (section.field), resolvido na hora do render."""
+    kind = "field"
+    __slots__ = ("key", "section", "field", "x", "y", "font_size")
+
+    def __init__(self, key: str, x: float, y: float, font_size: int):
+        self.key = key
+        self.section, _, self.field = key.partition(".")
+        self.x = x
+        self.y = y
+        self.font_size = font_size
+
+
+class TextOp:
+    """Texto fixo de layer."""
+    kind = "text"
+    __slots__ = ("text", "x", "y", "font_size")
+
+    def __init__(self, text: str, x: float, y: float, font_size: float):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.font_size = font_size
+
+
+class CheckOp:
+    kind = "check"
+    __slots__ = ("x", "y", "size")
+
+    def __init__(self, x: float, y: float, size: float):
+        self.x = x
+        self.y = y
+        self.size = size
+
+
+class LineOp:
+    kind = "line"
+    __slots__ = ("x1", "y1", "x2", "y2", "width")
+
+    def __init__(self, x1: float, y1: float, x2: float, y2: float, width: float):
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.width = width
+
+
+class CompiledTemplate:
+    """
+    (blank, fields, layers) já resolvidos → lista de operações por página.
+    `fields`/`layers` guardam o JSON original (usado pela validação).
+    """
+    __slots__ = (
+        "blank_pdf", "fields_path", "layers_path", "signature", "fields", "layers", "pages", "field_keys",
+        "static_pages", "dynamic_pages", "static_keys",
+    )
+
+    def __init__(self, blank_pdf, fields_path, layers_path, signature, fields, layers, pages):
+        self.blank_pdf = blank_pdf
+        self.fields_path = fields_path
+        self.layers_path = layers_path
+        self.signature = signature
+        self.fields = fields
+        self.layers = layers
+        self.pages = pages
+        self.field_keys = tuple(
+            op.key for ops in pages.values() for op in ops if op.kind == "field"
+        )
+
+        # estático: layers + company.* (1x por company/versão do template); dinâmico: job/owner/roof
+        self.static_pages: dict = {}
+        self.dynamic_pages: dict = {}
+        for pg, ops in pages.items():
+            for op in ops:
+                target = self.dynamic_pages if op.kind == "field" and op.section not in STATIC_SECTIONS else self.static_pages
+                target.setdefault(pg, []).append(op)
+        self.static_keys = tuple(
+            op.key for ops in self.static_pages.values() for op in ops if op.kind == "field"
+        )
+
+    def page_ops(self, page_index: int) -> list:
+        return self.pages.get(page_index, [])
+
+    def static_ops(self, page_index: int) -> list:
+        return self.static_pages.get(page_index, [])
+
+    def dynamic_ops(self, page_index: int) -> list:
+        return self.dynamic_pages.get(page_index, [])
+
+
+# ============================
+# Compilação
+# ============================
+
+def _load_json(path: str, default=None):
+    """Arquivo ausente/vazio → `default` (dict vazio se não passar nada)."""
+    empty = {} if default is None else default
+    if not path or not os.path.exists(path):
+        return empty
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+        if not content:
+            return empty
+        return json.loads(content)
+
+
+def _file_sig(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _compile_fields(fields: dict, pages: dict):
+    for key, cfg in fields.items():
+        # ✅ PATCH: se cfg não é dict, seu fields.json está no formato errado
+        if not isinstance(cfg, dict):
+            log.warning("fields.json: cfg inválido (não-dict)", extra={"fields": {"key": key, "cfg": repr(cfg)[:120]}})
+            continue
+
+        try:
+            op = FieldOp(key, float(cfg["x"]), float(cfg["y"]), int(cfg.get("font_size", 10)))
+            pg = int(cfg.get("page", 1))
+        except (KeyError, TypeError, ValueError):
+            log.warning("fields.json: cfg sem x/y/page válidos", extra={"fields": {"key": key, "cfg": repr(cfg)[:120]}})
+            continue
+
+        pages.setdefault(pg, []).append(op)
+
+
+def _compile_layers(layers: list, pages: dict):
+    for i, layer in enumerate(layers, start=1):
+        if not isinstance(layer, dict):
+            log.warning("layers.json: layer inválida (não-dict)", extra={"fields": {"index": i, "layer": repr(layer)[:120]}})
+            continue
+
+        t = layer.get("type")
+        try:
+            pg = int(layer.get("page", 1))
+            if t == "line":
+                op = LineOp(
+                    float(layer["x1"]),
+                    float(layer["y1"]),
+                    float(layer["x2"]),
+                    float(layer["y2"]),
+                    float(layer.get("width", 1)),
+                )
+            elif t == "check":
+                if not layer.get("checked", True):
+                    continue
+                op = CheckOp(float(layer["x"]), float(layer["y"]), float(layer.get("size", 12)))
+            elif t == "text":
+                op = TextOp(
+                    str(layer.get("value", "")),
+                    float(layer["x"]),
+                    float(layer["y"]),
+                    float(layer.get("font_size", 10)),
+                )
+            else:
+                continue
+        except (KeyError, TypeError, ValueError):
+            log.warning("layers.json: coordenadas inválidas", extra={"fields": {"index": i, "type": t, "layer": repr(layer)[:120]}})
+            continue
+
+        pages.setdefault(pg, []).append(op)
+
+
+def compile_template(blank_pdf: str, fields_path: str, layers_path: str) -> CompiledTemplate:
+    # assinatura antes da leitura: se o arquivo mudar no meio, o próximo get recompila
+    signature = (_file_sig(fields_path), _file_sig(layers_path))
+
+    fields = _load_json(fields_path)
+    if not isinstance(fields, dict):
+        log.warning("fields.json inválido (esperado dict)", extra={"fields": {"path": fields_path, "type": type(fields).__name__}})
+        fields = {}
+
+    # ✅ sem layers.json (ou vazio) é normal: só avisa se existir e não for lista
+    layers = _load_json(layers_path, [])
+    if not isinstance(layers, list):
+        log.warning("layers.json inválido (esperado lista)", extra={"fields": {"path": layers_path, "type": type(layers).__name__}})
+        layers = []
+
+    # fields primeiro, layers depois (mesma ordem de desenho de antes)
+    pages: dict = {}
+    _compile_fields(fields, pages)
+    _compile_layers(layers, pages)
+
+    return CompiledTemplate(
+        blank_pdf,
+        fields_path,
+        layers_path,
+        signature,
+        fields,
+        layers,
+        pages,
+    )
+
+
+# ============================
+# Cache (invalidado por mtime/size de fields/layers)
+# ============================
+
+_lock = threading.Lock()
+_compiled: dict = {}
+
+
+def get_compiled_template(blank_pdf: str, fields_path: str, layers_path: str) -> CompiledTemplate:
+    key = (blank_pdf, fields_path, layers_path)
+    sig = (_file_sig(fields_path), _file_sig(layers_path))
+
+    with _lock:
+        compiled = _compiled.get(key)
+    if compiled is not None and compiled.signature == sig:
+        metrics.inc("permit_plan_cache_total", result="hit")
+        return compiled
+
+    metrics.inc("permit_plan_cache_total", result="miss")
+    compiled = compile_template(blank_pdf, fields_path, layers_path)
+    with _lock:
+        _compiled[key] = compiled
+    return compiled
+
+
+def clear():
+    with _lock:
+        _compiled.clear()
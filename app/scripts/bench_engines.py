@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+APP_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
+
+# roda como script solto (python app\scripts\bench_engines.py): precisa do pacote `app`
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app import data_store, pdf_engine, render_cache  # noqa: E402
+from app.config_store import lookup_form_files  # noqa: E402
+
+ENGINES = ("reportlab", "direct")
+
+
+def _project_tasks(project_key: str):
+    project = data_store.load("projects").get(project_key)
+    if not isinstance(project, dict):
+        print(f"❌ Projeto não encontrado: {project_key}")
+        sys.exit(1)
+
+    company_key = project.get("company_key") or ""
+    values = {
+        "company": data_store.load("companies").get(company_key, {}),
+        "job": data_store.load("jobs").get(project.get("job_key") or "", {}),
+        "owner": data_store.load("owners").get(project.get("owner_key") or "", {}),
+        "roof": data_store.load("roofs").get(project.get("roof_key") or "", {}),
+    }
+    catalog = data_store.load("forms_catalog")
+
+    for item in project.get("forms", []) or []:
+        meta = (catalog.get(item.get("city")) or {}).get(item.get("form_key"))
+        if not isinstance(meta, dict):
+            continue
+        blank, fields, layers = lookup_form_files(
+            template_dir=os.path.join(ROOT_DIR, str(meta.get("template_dir", ""))),
+            company_key=company_key or None,
+            city=item["city"],
+            form_key=item["form_key"],
+        )
+        if blank:
+            yield f"{item['city']}/{item['form_key']}", blank, fields, layers, values
+
+
+def main():
+    """
+    Compara os engines de desenho (PERMIT_PDF_ENGINE) nos templates reais de um projeto:
+    tempo do 1º render, melhor tempo com cache quente e tamanho do PDF.
+    Uso: python app\\scripts\\bench_engines.py <project_key> [repetições]
+    """
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        sys.exit(1)
+
+    project_key = sys.argv[1]
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    # mede o render de verdade, não o render cache
+    render_cache.RENDER_CACHE_ENABLED = False
+
+    print(f"=== BENCH ENGINES ({project_key}, {runs}x) ===")
+    for label, blank, fields, layers, values in _project_tasks(project_key):
+        for engine in ENGINES:
+            pdf_engine.PDF_ENGINE = engine
+            times = []
+            size = 0
+            for _ in range(runs):
+                t = time.perf_counter()
+                size = len(pdf_engine.render_template_bytes(blank, fields, layers, values))
+                times.append(time.perf_counter() - t)
+            warm = min(times[1:]) if len(times) > 1 else times[0]
+            print(f"{label:<45} {engine:<10} 1º={times[0] * 1000:7.1f}ms  quente={warm * 1000:7.1f}ms  {size:>9} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 
 # Paths
@@ -6,6 +7,13 @@ SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))              # ...\app\s
 APP_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))            # ...\app
 ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))              # ...\
 
+# roda como script solto: precisa do pacote `app` no path
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.doctor_utils import validate_layers  # noqa: E402
+from app.template_manifest import get_manifest  # noqa: E402
+
 # ✅ igual ao pdf_engine: se existir data na raiz, usa ela; senão usa app/data
 DATA_DIR = os.path.join(ROOT_DIR, "data") if os.path.exists(os.path.join(ROOT_DIR, "data")) else os.path.join(APP_DIR, "data")
 CATALOG_PATH = os.path.join(DATA_DIR, "forms_catalog.json")
@@ -78,6 +86,24 @@ def main():
             print("  fields.json :", "OK" if ok_fields else "MISSING")
             print("  layers.json :", "OK" if ok_layers else "MISSING")
 
+            # ✅ manifest: páginas/hash sem reparsear o PDF (gera só se faltar ou estiver velho)
+            if ok_blank:
+                try:
+                    manifest = get_manifest(blank)
+                except Exception as e:
+                    print("  manifest    : ERRO", e)
+                    manifest = None
+
+                if manifest:
+                    print("  páginas     :", manifest["page_count"])
+                    print("  sha256      :", manifest["sha256"][:16])
+                    print("  AcroForm    :", "sim" if manifest["acroform"] else "não")
+
+                    layers_data = load_json(layers) if ok_layers else None
+                    if isinstance(layers_data, list):
+                        for w in validate_layers(layers_data, total_pages=manifest["page_count"]):
+                            print("  ⚠️", w)
+
             if status.startswith("✅"):
                 ok += 1
             else:
@@ -7,6 +7,13 @@ SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 APP_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
 
+# roda como script solto: precisa do pacote `app` no path
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.config_store import invalidate_index  # noqa: E402
+from app.data_store import write_json_atomic  # noqa: E402
+
 # ✅ manter coerente com o doctor/pdf_engine:
 # se existir /data na raiz, usa; senão app/data
 DATA_DIR = os.path.join(ROOT_DIR, "data") if os.path.exists(os.path.join(ROOT_DIR, "data")) else os.path.join(APP_DIR, "data")
@@ -29,14 +36,9 @@ def load_json(path: str):
         return json.loads(txt)
 
 
-def ensure_dir(path: str):
-    os.makedirs(path, exist_ok=True)
-
-
 def write_json(path: str, data):
-    ensure_dir(os.path.dirname(path))
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # temp + rename: a API pode estar lendo o mesmo override agora
+    write_json_atomic(path, data)
 
 
 def main():
@@ -84,6 +86,17 @@ def main():
     write_json(fields_path, fields)
     write_json(layers_path, layers)
     write_json(meta_path, meta)
+    invalidate_index()
+
+    # ✅ valida 1x aqui (resultado vai pro meta.json; o render só confere o carimbo)
+    validation = None
+    try:
+        from app.svc import get_blank_pdf_path
+        from app.template_validation import validate_and_store
+
+        validation = validate_and_store(get_blank_pdf_path(city, form_key), fields_path, layers_path)
+    except ValueError as e:
+        print(f"\n⚠️ Override gravado sem validação: {e}")
 
     print("\n✅ Override importado com sucesso!")
     print(f"DATA_DIR      : {DATA_DIR}")
@@ -93,6 +106,13 @@ def main():
     print(f"LAYERS        : {layers_path}")
     print(f"META          : {meta_path}")
 
+    if validation is not None:
+        for issue in validation["errors"]:
+            print(f"❌ {issue['target']} {issue['ref']}: {issue['message']}")
+        for issue in validation["warnings"]:
+            print(f"⚠️ {issue['target']} {issue['ref']}: {issue['message']}")
+        print("VALIDAÇÃO     :", "OK" if validation["ok"] else f"{len(validation['errors'])} erro(s)")
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import os
+import sys
+
+SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+APP_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
+
+# roda como script solto (python app\scripts\import_sqlite.py): precisa do pacote `app`
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app import data_store, sqlite_store  # noqa: E402
+
+
+def die(msg: str, code: int = 1):
+    print(f"\n❌ {msg}")
+    sys.exit(code)
+
+
+def main():
+    """
+    Importa data/*.json → data/permit.db (uma vez).
+    Depois disso: PERMIT_STORAGE=sqlite para a API/CLI lerem do banco.
+    Uso: python app\\scripts\\import_sqlite.py [--force]
+    """
+    force = "--force" in sys.argv[1:]
+
+    print("=== IMPORT JSON -> SQLITE ===")
+    print(f"DB: {sqlite_store.DB_PATH}")
+
+    for name in data_store.ENTITY_FILES:
+        path = data_store.entity_path(name)
+        if not os.path.exists(path):
+            print(f"- {name:<14} (sem {os.path.basename(path)}, pulando)")
+            continue
+
+        try:
+            data = data_store.load_json(path)
+        except ValueError as e:
+            die(f"{os.path.basename(path)} inválido: {e}")
+
+        if not isinstance(data, dict):
+            die(f"{os.path.basename(path)}: esperado objeto (dict) no topo")
+
+        if sqlite_store.kind_version(name) and not force:
+            print(f"- {name:<14} já existe no banco (use --force para sobrescrever)")
+            continue
+
+        sqlite_store.replace_kind(name, data)
+        print(f"✅ {name:<14} {len(data)} registros")
+
+    print("\nPronto. Para usar: PERMIT_STORAGE=sqlite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# app/sqlite_store.py
+import os
+import json
+import sqlite3
+import datetime
+import threading
+from typing import Any, Dict
+
+APP_DIR = os.path.abspath(os.path.dirname(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
+
+DB_PATH = os.environ.get("PERMIT_DB_PATH") or os.path.join(ROOT_DIR, "data", "permit.db")
+
+# 1 linha por registro (kind + key); `kinds.version` sobe a cada escrita (invalidação de cache)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id          INTEGER PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    UNIQUE (kind, key)
+);
+
+CREATE TABLE IF NOT EXISTS kinds (
+    kind    TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized: set = set()
+
+
+def _connect() -> sqlite3.Connection:
+    """Uma conexão por thread (sqlite3 não compartilha conexão entre threads)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "path", None) == DB_PATH:
+        return conn
+
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    # WAL: leitores não bloqueiam o escritor (API + CLI + jobs ao mesmo tempo)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    with _init_lock:
+        if DB_PATH not in _initialized:
+            conn.executescript(_SCHEMA)
+            _initialized.add(DB_PATH)
+
+    _local.conn = conn
+    _local.path = DB_PATH
+    return conn
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+def _bump(conn: sqlite3.Connection, kind: str):
+    conn.execute(
+        "INSERT INTO kinds (kind, version) VALUES (?, 1) "
+        "ON CONFLICT (kind) DO UPDATE SET version = version + 1",
+        (kind,),
+    )
+
+
+def _upsert(conn: sqlite3.Connection, kind: str, key: str, data: Any):
+    conn.execute(
+        "INSERT INTO entities (kind, key, data, updated_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+        (kind, key, json.dumps(data, ensure_ascii=False), _now()),
+    )
+
+
+# ============================
+# Leitura
+# ============================
+
+def kind_version(kind: str) -> int:
+    row = _connect().execute("SELECT version FROM kinds WHERE kind = ?", (kind,)).fetchone()
+    return row[0] if row else 0
+
+
+def load_kind(kind: str) -> Dict[str, Any]:
+    """Todos os registros do tipo, na ordem de inserção (mesmo formato do .json)."""
+    rows = _connect().execute(
+        "SELECT key, data FROM entities WHERE kind = ? ORDER BY id", (kind,)
+    ).fetchall()
+    return {key: json.loads(data) for key, data in rows}
+
+
+def get_record(kind: str, key: str) -> Any:
+    row = _connect().execute(
+        "SELECT data FROM entities WHERE kind = ? AND key = ?", (kind, key)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+# ============================
+# Escrita
+# ============================
+
+def upsert_record(kind: str, key: str, data: Any):
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _upsert(conn, kind, key, data)
+        _bump(conn, kind)
+
+
+def delete_record(kind: str, key: str):
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM entities WHERE kind = ? AND key = ?", (kind, key))
+        _bump(conn, kind)
+
+
+def replace_kind(kind: str, data: Dict[str, Any]):
+    """
+    Grava o dict inteiro (compat com save()): só toca nas linhas que mudaram
+    e apaga as chaves que sumiram.
+    """
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        current = dict(conn.execute("SELECT key, data FROM entities WHERE kind = ?", (kind,)).fetchall())
+
+        for key, value in data.items():
+            if current.get(key) != json.dumps(value, ensure_ascii=False):
+                _upsert(conn, kind, key, value)
+
+        gone = [k for k in current if k not in data]
+        conn.executemany("DELETE FROM entities WHERE kind = ? AND key = ?", [(kind, k) for k in gone])
+        _bump(conn, kind)
+
+
+def close():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
@@ -1,14 +1,19 @@
 # app/svc.py
+import io
 import os
+import gzip
 import json
+import hashlib
 import datetime
+import threading
 import platform
-from typing import Any, Dict, List, Optional, Tuple
-import shutil
-import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import zipfile
 
-from app.pdf_engine import _render_template_to_pdf
-from app.config_store import resolve_form_files
+from app.pdf_engine import form_fill, iter_render_forms
+from app.config_store import invalidate_index, lookup_form_files, warm_index
+from app import data_store, list_index, metrics, packet_deps, template_cache, template_manifest, template_validation
+from app.log import get_logger
 
 APP_DIR = os.path.abspath(os.path.dirname(__file__))
 ROOT_DIR = os.path.abspath(os.path.join(APP_DIR, ".."))
@@ -24,19 +29,12 @@ OWNERS_FILE = os.path.join(DATA_DIR, "owners.json")
 ROOFS_FILE = os.path.join(DATA_DIR, "roofs.json")
 FORMS_CATALOG_FILE = os.path.join(DATA_DIR, "forms_catalog.json")
 
-
-def _load_json(path: str):
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        txt = f.read().strip()
-        return json.loads(txt) if txt else {}
+log = get_logger("svc")
 
 
 def _write_json(path: str, data: Any):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # temp + rename: o render nunca lê um fields/layers pela metade
+    data_store.write_json_atomic(path, data)
 
 
 def save_override_payload(payload: Dict[str, Any]):
@@ -62,182 +60,221 @@ def save_override_payload(payload: Dict[str, Any]):
             "form_key": form_key,
         },
     )
+    invalidate_index()
+
+    # ✅ validação roda aqui (1x por save) e fica gravada no meta.json; o render só confere o carimbo
+    validation = None
+    try:
+        blank_pdf = get_blank_pdf_path(city, form_key)
+        validation = template_validation.validate_and_store(blank_pdf, fields_path, layers_path)
+    except ValueError as e:
+        log.warning("override salvo sem validação", extra={"fields": {"city": city, "form_key": form_key, "error": str(e)}})
 
     return {
         "dest_dir": dest_dir,
         "fields": fields_path,
         "layers": layers_path,
         "meta": meta_path,
+        "validation": validation,
     }
 
 
-def generate_packet_by_project(project_key: str):
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-    projects = _load_json(PROJECTS_FILE)
-    companies = _load_json(COMPANIES_FILE)
-    jobs = _load_json(JOBS_FILE)
-    owners = _load_json(OWNERS_FILE)
-    roofs = _load_json(ROOFS_FILE)
-    catalog = _load_json(FORMS_CATALOG_FILE)
+def _build_form_task(
+    catalog: Dict[str, Any],
+    city: str,
+    form_key: str,
+    company_key: Optional[str],
+    values: Dict[str, Any],
+    out_folder: str,
+) -> Optional[Dict[str, Any]]:
+    form_meta = (catalog.get(city) or {}).get(form_key)
+    if not isinstance(form_meta, dict):
+        return None
+
+    template_dir = os.path.join(ROOT_DIR, str(form_meta.get("template_dir", "")))
+
+    with metrics.timer("resolve", city=city, form_key=form_key, company=company_key or ""):
+        blank_pdf, fields_path, layers_path = lookup_form_files(
+            template_dir=template_dir,
+            company_key=company_key if company_key else None,
+            city=city,
+            form_key=form_key,
+        )
 
-    project = projects.get(project_key)
-    if not isinstance(project, dict):
-        raise ValueError(f"Projeto não encontrado: {project_key}")
+        if not blank_pdf:
+            return None
 
-    company_key = project.get("company_key") or ""
-    values = {
-        "company": companies.get(company_key, {}),
-        "job": jobs.get(project.get("job_key") or "", {}),
-        "owner": owners.get(project.get("owner_key") or "", {}),
-        "roof": roofs.get(project.get("roof_key") or "", {}),
+    return {
+        "city": city,
+        "form_key": form_key,
+        "company_key": company_key or "",
+        "blank_pdf": blank_pdf,
+        "fields_path": fields_path,
+        "layers_path": layers_path,
+        "values": values,
+        "out_path": os.path.join(out_folder, f"{city}__{form_key}.pdf"),
+        "fill": form_fill(form_meta),
     }
 
-    forms = project.get("forms", [])
-    if not forms:
-        return {"out_folder": None, "generated": [], "warning": "Projeto sem forms."}
 
-    out_folder = os.path.join(
-        OUTPUT_DIR,
-        f"{project_key}_{datetime.datetime.now():%Y%m%d_%H%M%S}",
-    )
-    os.makedirs(out_folder, exist_ok=True)
+ProgressFn = Callable[[Dict[str, Any]], None]
+
 
+def _run_form_tasks(
+    tasks: List[Dict[str, Any]],
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressFn] = None,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Renderiza as tasks (ordem preservada) → (generated, errors por form).
+    on_progress recebe {"type": "planned", "forms": [...]} e depois um
+    {"type": "form", city, form_key, out_path, error} por form concluído.
+    """
     generated: List[str] = []
+    errors: List[Dict[str, Any]] = []
 
-    for item in forms:
-        city = item.get("city")
-        form_key = item.get("form_key")
-        if not city or not form_key:
-            continue
+    if on_progress:
+        on_progress({
+            "type": "planned",
+            "forms": [{"city": t["city"], "form_key": t["form_key"]} for t in tasks],
+        })
 
-        form_meta = (catalog.get(city) or {}).get(form_key)
-        if not form_meta:
-            continue
+    for res in iter_render_forms(tasks, workers=workers):
+        if on_progress:
+            on_progress({"type": "form", **res})
 
-        template_dir = os.path.join(ROOT_DIR, form_meta["template_dir"])
+        if res["error"]:
+            errors.append({"city": res["city"], "form_key": res["form_key"], "error": res["error"]})
+        else:
+            generated.append(res["out_path"])
 
-        blank_pdf, fields_path, layers_path = resolve_form_files(
-            template_dir=template_dir,
-            company_key=company_key if company_key else None,
-            city=city,
-            form_key=form_key,
-        )
+    return generated, errors
 
-        if not os.path.exists(blank_pdf):
-            continue
 
-        out_path = os.path.join(out_folder, f"{city}__{form_key}.pdf")
+def _record_packet(plan: Dict[str, Any], generated: List[str]):
+    """Grava o que cada form gerado lê (OUTPUT_DIR/_packets) → base do refresh_packets."""
+    done = set(generated)
+    try:
+        forms = [packet_deps.form_entry(t) for t in plan["tasks"] if t["out_path"] in done]
+        packet_deps.write_record(OUTPUT_DIR, plan["out_folder"], plan["source"], forms)
+    except (OSError, ValueError):
+        log.warning("não foi possível gravar dependências do packet", extra={"fields": {"out_folder": plan["out_folder"]}})
 
-        _render_template_to_pdf(
-            blank_pdf,
-            fields_path,
-            layers_path,
-            values,
-            out_path,
-        )
 
-        generated.append(out_path)
+def _project_values(project: Dict[str, Any], companies, jobs, owners, roofs) -> Dict[str, Any]:
+    return {
+        "company": companies.get(project.get("company_key") or "", {}),
+        "job": jobs.get(project.get("job_key") or "", {}),
+        "owner": owners.get(project.get("owner_key") or "", {}),
+        "roof": roofs.get(project.get("roof_key") or "", {}),
+    }
 
-    return {"out_folder": out_folder, "generated": generated}
 
+def _plan_project_packet(project_key: str) -> Dict[str, Any]:
+    """Carrega os dados do projeto e monta as tasks de render (sem renderizar)."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def zip_folder(folder_path: str) -> str:
-    abs_folder = os.path.abspath(folder_path)
-    abs_out = os.path.abspath(OUTPUT_DIR)
+    with metrics.timer("data_load"):
+        projects = data_store.load("projects")
+        companies = data_store.load("companies")
+        jobs = data_store.load("jobs")
+        owners = data_store.load("owners")
+        roofs = data_store.load("roofs")
+        catalog = data_store.load("forms_catalog")
 
-    # segurança: só permite zip dentro do OUTPUT_DIR
-    if not abs_folder.startswith(abs_out):
-        raise ValueError("Caminho fora do output permitido para zip.")
+    project = projects.get(project_key)
+    if not isinstance(project, dict):
+        raise ValueError(f"Projeto não encontrado: {project_key}")
 
-    zip_dir = os.path.join(OUTPUT_DIR, "_zips")
-    os.makedirs(zip_dir, exist_ok=True)
+    company_key = project.get("company_key") or ""
+    values = _project_values(project, companies, jobs, owners, roofs)
 
-    base_name = os.path.basename(abs_folder)
-    zip_base = os.path.join(zip_dir, f"{base_name}_{uuid.uuid4().hex[:8]}")
+    forms = project.get("forms", [])
+    if not forms:
+        return {"out_folder": None, "tasks": [], "warning": "Projeto sem forms."}
 
-    # shutil.make_archive cria .zip
-    zip_path = shutil.make_archive(zip_base, "zip", abs_folder)
-    return zip_path
+    out_folder = os.path.join(
+        OUTPUT_DIR,
+        f"{project_key}_{datetime.datetime.now():%Y%m%d_%H%M%S}",
+    )
+    os.makedirs(out_folder, exist_ok=True)
 
+    tasks: List[Dict[str, Any]] = []
 
-def generate_and_zip_project(project_key: str) -> dict:
-    result = generate_packet_by_project(project_key)
-    out_folder = result.get("out_folder")
-    if not out_folder:
-        return {"out_folder": None, "zip_path": None, "generated": result.get("generated", [])}
+    for item in forms:
+        city = item.get("city")
+        form_key = item.get("form_key")
+        if not city or not form_key:
+            continue
 
-    zip_path = zip_folder(out_folder)
-    return {"out_folder": out_folder, "zip_path": zip_path, "generated": result.get("generated", [])}
+        task = _build_form_task(catalog, city, form_key, company_key, values, out_folder)
+        if task:
+            tasks.append(task)
 
+    source = {"kind": "project", "project_key": project_key}
+    return {"out_folder": out_folder, "tasks": tasks, "source": source}
 
 
-def generate_and_zip_company(
-    company_key: str,
-    city: str,
-    form_keys: List[str],
-    job_key: Optional[str] = None,
-    owner_key: Optional[str] = None,
-    roof_key: Optional[str] = None,
-) -> dict:
-    result = generate_packet_for_company(
-        company_key=company_key,
-        city=city,
-        form_keys=form_keys,
-        job_key=job_key,
-        owner_key=owner_key,
-        roof_key=roof_key,
-    )
+def generate_packet_by_project(
+    project_key: str,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressFn] = None,
+):
+    plan = _plan_project_packet(project_key)
+    if not plan["out_folder"]:
+        return {"out_folder": None, "generated": [], "warning": plan.get("warning")}
 
-    # ✅ LOG FORTE (vai aparecer no terminal do backend)
-    print("[DEBUG] svc.py =", __file__)
-    print("[DEBUG] generate_packet_for_company type =", type(result))
-    print("[DEBUG] generate_packet_for_company preview =", repr(result)[:300])
+    generated, errors = _run_form_tasks(plan["tasks"], workers=workers, on_progress=on_progress)
+    _record_packet(plan, generated)
 
-    # ✅ Se por algum motivo vier string, não deixa explodir em .get()
-    if isinstance(result, str):
-        result = {"out_folder": result, "generated": []}
+    return {"out_folder": plan["out_folder"], "generated": generated, "errors": errors}
 
-    if not isinstance(result, dict):
-        raise TypeError(
-            f"generate_packet_for_company retornou {type(result)}: {repr(result)[:300]}"
-        )
 
-    out_folder = result.get("out_folder")
-    if not out_folder:
-        return {
-            "out_folder": None,
-            "zip_path": None,
-            "generated": result.get("generated", []),
+def _project_items():
+    projects = data_store.load("projects")
+    if not isinstance(projects, dict):
+        return
+    for k, p in projects.items():
+        if not isinstance(p, dict):
+            continue
+        name = p.get("name") or k
+        forms = p.get("forms", []) or []
+        row = {
+            "key": k,
+            "name": name,
+            "company_key": p.get("company_key"),
+            "forms_count": len(forms),
         }
+        cities = [f.get("city") for f in forms if isinstance(f, dict)]
+        yield (str(name).lower(), k), row, {"company_key": [p.get("company_key")], "city": cities}
 
-    zip_path = zip_folder(out_folder)
-    return {
-        "out_folder": out_folder,
-        "zip_path": zip_path,
-        "generated": result.get("generated", []),
-    }
 
+def _projects_index() -> list_index.SortedIndex:
+    return list_index.get_index("projects", data_store.entity_version("projects"), _project_items)
 
 
+def list_projects():
+    # índice já ordenado (reconstruído só quando projects muda)
+    return [dict(r) for r in _projects_index().rows]
 
 
-def list_projects():
-    projects = _load_json(PROJECTS_FILE)
-    out = []
-    for k, p in projects.items():
-        if not isinstance(p, dict):
-            continue
-        out.append(
-            {
-                "key": k,
-                "name": p.get("name") or k,
-                "company_key": p.get("company_key"),
-                "forms_count": len(p.get("forms", []) or []),
-            }
-        )
-    out.sort(key=lambda x: (x["name"] or "").lower())
-    return out
+def page_projects(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    company_key: Optional[str] = None,
+    city: Optional[str] = None,
+    prefix: Optional[str] = None,
+) -> Dict[str, Any]:
+    items, next_cursor = list_index.query(
+        _projects_index(),
+        cursor=cursor,
+        limit=limit,
+        prefix=prefix,
+        facets={"company_key": company_key, "city": city},
+        fields=fields,
+    )
+    return {"projects": items, "next_cursor": next_cursor}
 
 
 def open_folder(path: str):
@@ -259,7 +296,7 @@ def open_folder(path: str):
 # ============================
 
 def get_catalog() -> Dict[str, Any]:
-    return _load_json(FORMS_CATALOG_FILE)
+    return data_store.load("forms_catalog")
 
 
 def list_cities() -> List[str]:
@@ -288,50 +325,117 @@ def list_forms_for_city(city: str) -> List[Dict[str, Any]]:
     return out
 
 
-def list_companies() -> List[Dict[str, Any]]:
-    companies = _load_json(COMPANIES_FILE)
-    out: List[Dict[str, Any]] = []
+def _company_items():
+    companies = data_store.load("companies")
     if not isinstance(companies, dict):
-        return out
+        return
     for k, v in companies.items():
         if not isinstance(v, dict):
             continue
-        out.append({"company_key": k, **v})
-    out.sort(key=lambda x: (str(x.get("name") or x.get("company_key") or "")).lower())
-    return out
+        row = {"company_key": k, **v}
+        yield (str(v.get("name") or k).lower(), k), row, {"company_key": [k], "city": [v.get("city")]}
 
 
-def upsert_company(company_key: str, company_data: Dict[str, Any]) -> Dict[str, Any]:
-    companies = _load_json(COMPANIES_FILE)
-    if not isinstance(companies, dict):
-        companies = {}
+def _companies_index() -> list_index.SortedIndex:
+    return list_index.get_index("companies", data_store.entity_version("companies"), _company_items)
 
-    base = companies.get(company_key)
+
+def list_companies() -> List[Dict[str, Any]]:
+    return [dict(r) for r in _companies_index().rows]
+
+
+def page_companies(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    company_key: Optional[str] = None,
+    city: Optional[str] = None,
+    prefix: Optional[str] = None,
+) -> Dict[str, Any]:
+    items, next_cursor = list_index.query(
+        _companies_index(),
+        cursor=cursor,
+        limit=limit,
+        prefix=prefix,
+        facets={"company_key": company_key, "city": city},
+        fields=fields,
+    )
+    return {"companies": items, "next_cursor": next_cursor}
+
+
+def upsert_company(company_key: str, company_data: Dict[str, Any]) -> Dict[str, Any]:
+    base = data_store.get_record("companies", company_key)
     if not isinstance(base, dict):
         base = {}
 
     merged = {**base, **company_data}
     merged["updated_at"] = datetime.datetime.now().isoformat()
 
-    companies[company_key] = merged
-    _write_json(COMPANIES_FILE, companies)
+    data_store.upsert_record("companies", company_key, merged)
 
     return {"company_key": company_key, **merged}
 
 
 def get_company(company_key: str) -> Dict[str, Any]:
-    companies = _load_json(COMPANIES_FILE)
-    v = companies.get(company_key) if isinstance(companies, dict) else None
+    v = data_store.get_record("companies", company_key)
     if not isinstance(v, dict):
         raise ValueError(f"Company não encontrada: {company_key}")
     return {"company_key": company_key, **v}
 
 
+# ============================
+# Bootstrap (1 request com tudo que a UI precisa no load)
+# ============================
+
+BOOTSTRAP_ENTITIES = ("forms_catalog", "companies", "projects", "jobs", "owners", "roofs")
+
+_bootstrap_lock = threading.Lock()
+# versão -> {"version", "json", "gzip"}
+_bootstrap_cache: Dict[str, Dict[str, Any]] = {}
+
+
+def bootstrap_version() -> str:
+    """Muda só quando algum dos arquivos/tabelas de dados muda (data_store.entity_version)."""
+    sigs = [(name, data_store.entity_version(name)) for name in BOOTSTRAP_ENTITIES]
+    return hashlib.sha256(repr(sigs).encode("utf-8")).hexdigest()[:32]
+
+
+def get_bootstrap() -> Dict[str, Any]:
+    """
+    Snapshot versionado: catálogo, companies, projects e tabelas (jobs/owners/roofs).
+    Serializado (JSON + gzip) 1x por versão; requests seguintes só devolvem os bytes.
+    """
+    version = bootstrap_version()
+    with _bootstrap_lock:
+        cached = _bootstrap_cache.get(version)
+    if cached is not None:
+        return cached
+
+    cities = list_cities()
+    snapshot = {
+        "ok": True,
+        "version": version,
+        "cities": cities,
+        "forms": {city: list_forms_for_city(city) for city in cities},
+        "companies": list_companies(),
+        "projects": list_projects(),
+        "data": {name: data_store.load(name) for name in ("jobs", "owners", "roofs")},
+    }
+    raw = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    entry = {"version": version, "json": raw, "gzip": gzip.compress(raw, compresslevel=6)}
+
+    with _bootstrap_lock:
+        # só a versão atual interessa
+        _bootstrap_cache.clear()
+        _bootstrap_cache[version] = entry
+    return entry
+
+
 # ============================
 # Generate por City/Forms
 # ============================
 
-def generate_packet_for_company(
+def _plan_company_packet(
     company_key: str,
     city: str,
     form_keys: List[str],
@@ -339,13 +443,15 @@ def generate_packet_for_company(
     owner_key: Optional[str] = None,
     roof_key: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """Carrega company/job/owner/roof e monta as tasks de render (sem renderizar)."""
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    companies = _load_json(COMPANIES_FILE)
-    jobs = _load_json(JOBS_FILE)
-    owners = _load_json(OWNERS_FILE)
-    roofs = _load_json(ROOFS_FILE)
-    catalog = _load_json(FORMS_CATALOG_FILE)
+    with metrics.timer("data_load", company=company_key):
+        companies = data_store.load("companies")
+        jobs = data_store.load("jobs")
+        owners = data_store.load("owners")
+        roofs = data_store.load("roofs")
+        catalog = data_store.load("forms_catalog")
 
     company_obj = companies.get(company_key) if isinstance(companies, dict) else None
     if not isinstance(company_obj, dict):
@@ -364,42 +470,313 @@ def generate_packet_for_company(
     )
     os.makedirs(out_folder, exist_ok=True)
 
-    generated: List[str] = []
+    tasks: List[Dict[str, Any]] = []
 
     for form_key in form_keys:
-        form_meta = (catalog.get(city) or {}).get(form_key)
-        if not isinstance(form_meta, dict):
-            continue
+        task = _build_form_task(catalog, city, form_key, company_key, values, out_folder)
+        if task:
+            tasks.append(task)
+
+    source = {
+        "kind": "company",
+        "company_key": company_key,
+        "city": city,
+        "form_keys": list(form_keys),
+        "job_key": job_key,
+        "owner_key": owner_key,
+        "roof_key": roof_key,
+    }
+    return {"out_folder": out_folder, "tasks": tasks, "source": source}
 
-        template_dir = os.path.join(ROOT_DIR, str(form_meta.get("template_dir", "")))
 
-        blank_pdf, fields_path, layers_path = resolve_form_files(
-            template_dir=template_dir,
-            company_key=company_key,
-            city=city,
-            form_key=form_key,
-        )
+def generate_packet_for_company(
+    company_key: str,
+    city: str,
+    form_keys: List[str],
+    job_key: Optional[str] = None,
+    owner_key: Optional[str] = None,
+    roof_key: Optional[str] = None,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressFn] = None,
+) -> Dict[str, Any]:
+    plan = _plan_company_packet(company_key, city, form_keys, job_key, owner_key, roof_key)
 
-        if not os.path.exists(blank_pdf):
-            continue
+    generated, errors = _run_form_tasks(plan["tasks"], workers=workers, on_progress=on_progress)
+    _record_packet(plan, generated)
 
-        out_path = os.path.join(out_folder, f"{city}__{form_key}.pdf")
+    # ✅ PATCH CORRETO (definitivo)
+    return {
+        "out_folder": plan["out_folder"],
+        "generated": generated,
+        "errors": errors,
+    }
 
-        _render_template_to_pdf(
-            blank_pdf,
-            fields_path,
-            layers_path,
-            values,
-            out_path,
-        )
 
-        generated.append(out_path)
+# ============================
+# Refresh de packets existentes (só os forms afetados por mudança de dados/template)
+# ============================
 
-    # ✅ PATCH CORRETO (definitivo)
-    return {
-        "out_folder": out_folder,
-        "generated": generated
+def _refresh_plan(rec: Dict[str, Any], projects, companies, jobs, owners, roofs, catalog) -> Optional[Dict[str, Any]]:
+    """Tasks atuais de um packet já gerado, a partir da origem gravada no registro."""
+    source = rec.get("source") or {}
+    out_folder = os.path.join(OUTPUT_DIR, rec["out_folder"])
+
+    if source.get("kind") == "project":
+        project = projects.get(source.get("project_key") or "")
+        if not isinstance(project, dict):
+            return None
+        company_key = project.get("company_key") or ""
+        values = _project_values(project, companies, jobs, owners, roofs)
+        forms = [(f.get("city"), f.get("form_key")) for f in project.get("forms", []) or [] if isinstance(f, dict)]
+    elif source.get("kind") == "company":
+        company_key = source.get("company_key") or ""
+        company_obj = companies.get(company_key)
+        if not isinstance(company_obj, dict):
+            return None
+        values = {
+            "company": company_obj,
+            "job": jobs.get(source.get("job_key") or "", {}),
+            "owner": owners.get(source.get("owner_key") or "", {}),
+            "roof": roofs.get(source.get("roof_key") or "", {}),
+        }
+        forms = [(source.get("city"), fk) for fk in source.get("form_keys") or []]
+    else:
+        return None
+
+    tasks = []
+    for city, form_key in forms:
+        if not city or not form_key:
+            continue
+        task = _build_form_task(catalog, city, form_key, company_key, values, out_folder)
+        if task:
+            tasks.append(task)
+    return {"out_folder": out_folder, "tasks": tasks, "source": source, "company_key": company_key}
+
+
+def refresh_packets(
+    company_key: Optional[str] = None,
+    project_key: Optional[str] = None,
+    dry_run: bool = False,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressFn] = None,
+) -> Dict[str, Any]:
+    """
+    Revê os packets já gerados (registro em OUTPUT_DIR/_packets) contra os dados atuais.
+    Form cujo render_key (template + valores que ele lê) não mudou fica como está;
+    só os afetados são renderizados de novo, na mesma pasta. Filtra por company/projeto.
+    """
+    with metrics.timer("data_load"):
+        projects = data_store.load("projects")
+        companies = data_store.load("companies")
+        jobs = data_store.load("jobs")
+        owners = data_store.load("owners")
+        roofs = data_store.load("roofs")
+        catalog = data_store.load("forms_catalog")
+
+    packets: List[Dict[str, Any]] = []
+    to_render: List[Dict[str, Any]] = []
+    stale: List[Dict[str, Any]] = []
+    carried = 0
+
+    for rec in packet_deps.iter_records(OUTPUT_DIR):
+        source = rec.get("source") or {}
+        if project_key and source.get("project_key") != project_key:
+            continue
+        plan = _refresh_plan(rec, projects, companies, jobs, owners, roofs, catalog)
+        if plan is None:
+            continue
+        if company_key and plan["company_key"] != company_key:
+            continue
+
+        old_forms = {(f.get("city"), f.get("form_key")): f for f in rec.get("forms") or []}
+        entries: Dict[str, Dict[str, Any]] = {}
+        for task in plan["tasks"]:
+            entry = packet_deps.form_entry(task)
+            entries[task["out_path"]] = entry
+            old = old_forms.get((task["city"], task["form_key"]))
+            if old and old.get("render_key") == entry["render_key"] and os.path.exists(task["out_path"]):
+                carried += 1
+                continue
+            to_render.append(task)
+            stale.append({
+                "out_folder": rec["out_folder"],
+                "city": task["city"],
+                "form_key": task["form_key"],
+                "changed": packet_deps.changed_reads(old, entry) if old else None,
+            })
+
+        # forms que saíram do projeto
+        current = {(t["city"], t["form_key"]) for t in plan["tasks"]}
+        removed = [f for k, f in old_forms.items() if k not in current]
+        packets.append({"rec": rec, "plan": plan, "entries": entries, "removed": removed})
+
+    result: Dict[str, Any] = {
+        "packets": len(packets),
+        "carried": carried,
+        "stale": stale,
+        "generated": [],
+        "removed": [],
+        "errors": [],
     }
+    if dry_run:
+        return result
+
+    generated, errors = _run_form_tasks(to_render, workers=workers, on_progress=on_progress)
+    done = set(generated)
+    attempted = {t["out_path"] for t in to_render}
+
+    for p in packets:
+        rec, plan = p["rec"], p["plan"]
+        old_forms = {(f.get("city"), f.get("form_key")): f for f in rec.get("forms") or []}
+        forms = []
+        for task in plan["tasks"]:
+            path = task["out_path"]
+            if path not in attempted or path in done:
+                forms.append(p["entries"][path])
+            elif (task["city"], task["form_key"]) in old_forms:
+                # falhou no render → mantém o registro antigo (tenta de novo no próximo refresh)
+                forms.append(old_forms[(task["city"], task["form_key"])])
+
+        for f in p["removed"]:
+            path = os.path.join(plan["out_folder"], str(f.get("file") or ""))
+            if f.get("file") and os.path.exists(path):
+                os.remove(path)
+                result["removed"].append(path)
+
+        packet_deps.write_record(OUTPUT_DIR, plan["out_folder"], rec.get("source") or plan["source"], forms)
+
+    result["generated"] = generated
+    result["errors"] = errors
+    log.info(
+        "packets revistos",
+        extra={"fields": {"packets": len(packets), "carried": carried, "rendered": len(generated), "errors": len(errors)}},
+    )
+    return result
+
+
+# ============================
+# ✅ ZIP em streaming (download direto do render, sem zip intermediário)
+# ============================
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Destino não-seekable do ZipFile: acumula o que foi escrito até o próximo drain()."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _stored_info(name: str) -> zipfile.ZipInfo:
+    # PDF já é comprimido → ZIP_STORED (sem deflate de novo)
+    info = zipfile.ZipInfo(name, date_time=datetime.datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+def _iter_zip_stream(plan: Dict[str, Any], workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Renderiza os forms (PDF ainda vai pro out_folder) e já escreve cada um no ZIP
+    assim que fica pronto.
+    """
+    tasks = plan["tasks"]
+    buf = _ZipStreamBuffer()
+    errors: List[str] = []
+    generated: List[str] = []
+
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for res in iter_render_forms([{**t, "return_bytes": True} for t in tasks], workers=workers):
+            if res["error"]:
+                errors.append(f"{res['city']}/{res['form_key']}: {res['error']}")
+                log.warning("form fora do ZIP (falhou no render)", extra={"fields": {"city": res["city"], "form_key": res["form_key"], "error": res["error"]}})
+                continue
+
+            generated.append(res["out_path"])
+            with metrics.timer("zip", city=res["city"], form_key=res["form_key"]):
+                zf.writestr(_stored_info(os.path.basename(res["out_path"])), res["pdf"])
+
+            chunk = buf.drain()
+            if chunk:
+                yield chunk
+
+        if errors:
+            zf.writestr("_errors.txt", "\n".join(errors) + "\n")
+
+    yield buf.drain()
+    _record_packet(plan, generated)
+
+
+ZIP_READ_CHUNK = 1024 * 1024
+
+
+def stream_zip_packet(result: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    ZIP (em streaming) de um packet já gerado (resultado de generate_packet_*, ex.: job):
+    lê os PDFs do out_folder em blocos; nenhum ZIP fica no disco.
+    """
+    abs_out = os.path.abspath(OUTPUT_DIR)
+    paths = [p for p in result.get("generated") or [] if os.path.abspath(p).startswith(abs_out)]
+    errors = [f"{e['city']}/{e['form_key']}: {e['error']}" for e in result.get("errors") or []]
+    buf = _ZipStreamBuffer()
+
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for path in paths:
+            try:
+                src = open(path, "rb")
+            except OSError:
+                errors.append(f"{os.path.basename(path)}: arquivo não existe mais")
+                continue
+            with src, zf.open(_stored_info(os.path.basename(path)), "w", force_zip64=True) as dst:
+                while True:
+                    block = src.read(ZIP_READ_CHUNK)
+                    if not block:
+                        break
+                    dst.write(block)
+                    chunk = buf.drain()
+                    if chunk:
+                        yield chunk
+
+        if errors:
+            zf.writestr("_errors.txt", "\n".join(errors) + "\n")
+
+    yield buf.drain()
+
+
+def stream_zip_project(project_key: str, workers: Optional[int] = None) -> Optional[Iterator[bytes]]:
+    """
+    Prepara o packet já (projeto inexistente levanta antes do primeiro byte) e devolve
+    o gerador do ZIP, ou None se não houver nenhum form para gerar.
+    """
+    plan = _plan_project_packet(project_key)
+    if not plan["tasks"]:
+        return None
+    return _iter_zip_stream(plan, workers=workers)
+
+
+def stream_zip_company(
+    company_key: str,
+    city: str,
+    form_keys: List[str],
+    job_key: Optional[str] = None,
+    owner_key: Optional[str] = None,
+    roof_key: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> Optional[Iterator[bytes]]:
+    plan = _plan_company_packet(company_key, city, form_keys, job_key, owner_key, roof_key)
+    if not plan["tasks"]:
+        return None
+    return _iter_zip_stream(plan, workers=workers)
 
 
 # ============================
@@ -426,8 +803,50 @@ def get_data_file_path(name: str) -> str:
 
 
 def load_data(name: str):
-    path = get_data_file_path(name)
-    return _load_json(path)
+    get_data_file_path(name)  # valida o nome
+    name = (name or "").lower().strip()
+    return data_store.load("forms_catalog" if name == "catalog" else name)
+
+
+def _data_items(entity: str):
+    data = data_store.load(entity)
+    if not isinstance(data, dict):
+        return
+    for k, v in data.items():
+        meta = v if isinstance(v, dict) else {}
+        # sem "name" (jobs/roofs) → ordena pela chave
+        text = str(meta.get("name") or k).lower()
+        yield (text, k), {"key": k, "value": v}, {"company_key": [meta.get("company_key")], "city": [meta.get("city")]}
+
+
+def page_data(
+    name: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    company_key: Optional[str] = None,
+    city: Optional[str] = None,
+    prefix: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Página de /api/data/{name}: mesmo formato {chave: valor}, na ordem do índice."""
+    get_data_file_path(name)
+    name = (name or "").lower().strip()
+    entity = "forms_catalog" if name == "catalog" else name
+
+    idx = list_index.get_index(f"data:{entity}", data_store.entity_version(entity), lambda: _data_items(entity))
+    rows, next_cursor = list_index.query(
+        idx,
+        cursor=cursor,
+        limit=limit,
+        prefix=prefix,
+        facets={"company_key": company_key, "city": city},
+    )
+
+    out: Dict[str, Any] = {}
+    for r in rows:
+        v = r["value"]
+        out[r["key"]] = list_index.project_fields(v, fields) if isinstance(v, dict) else v
+    return {"data": out, "next_cursor": next_cursor}
 
 
 # ============================
@@ -447,38 +866,84 @@ def _get_template_dir_from_catalog(city: str, form_key: str) -> str:
 
 def get_blank_pdf_path(city: str, form_key: str) -> str:
     template_dir = _get_template_dir_from_catalog(city, form_key)
-    blank_pdf, _, _ = resolve_form_files(
+    blank_pdf, _, _ = lookup_form_files(
         template_dir=template_dir,
         company_key=None,  # blank é sempre o original
         city=city,
         form_key=form_key,
     )
-    if not os.path.exists(blank_pdf):
-        raise ValueError(f"blank.pdf não encontrado: {blank_pdf}")
+    if not blank_pdf:
+        raise ValueError(f"blank.pdf não encontrado em: {template_dir}")
     return blank_pdf
 
 
 def get_fields_json_path(city: str, form_key: str, company_key: Optional[str] = None) -> str:
     template_dir = _get_template_dir_from_catalog(city, form_key)
-    _, fields_path, _ = resolve_form_files(
+    _, fields_path, _ = lookup_form_files(
         template_dir=template_dir,
         company_key=company_key,
         city=city,
         form_key=form_key,
     )
-    if not os.path.exists(fields_path):
-        raise ValueError(f"fields.json não encontrado: {fields_path}")
+    if not fields_path:
+        raise ValueError(f"fields.json não encontrado em: {template_dir}")
     return fields_path
 
 
 def get_layers_json_path(city: str, form_key: str, company_key: Optional[str] = None) -> str:
     template_dir = _get_template_dir_from_catalog(city, form_key)
-    _, _, layers_path = resolve_form_files(
+    _, _, layers_path = lookup_form_files(
         template_dir=template_dir,
         company_key=company_key,
         city=city,
         form_key=form_key,
     )
-    if not os.path.exists(layers_path):
-        raise ValueError(f"layers.json não encontrado: {layers_path}")
+    if not layers_path:
+        raise ValueError(f"layers.json não encontrado em: {template_dir}")
     return layers_path
+
+
+def warm_template_index():
+    """Índice de templates do catálogo + overrides (chamado no startup da API)."""
+    template_dirs = [
+        os.path.join(ROOT_DIR, str(meta["template_dir"]))
+        for forms in get_catalog().values()
+        if isinstance(forms, dict)
+        for meta in forms.values()
+        if isinstance(meta, dict) and meta.get("template_dir")
+    ]
+    warm_index(template_dirs)
+
+    # manifest + validação de cada template base: só refaz o que falta/mudou
+    for tdir in template_dirs:
+        blank_pdf, fields_path, layers_path = lookup_form_files(tdir, None, "", "")
+        if not blank_pdf:
+            continue
+        try:
+            template_manifest.get_manifest(blank_pdf)
+            template_validation.ensure_validated_files(blank_pdf, fields_path, layers_path)
+        except Exception:
+            log.exception("falha ao preparar template", extra={"fields": {"template_dir": tdir}})
+
+
+def get_template_manifest(city: str, form_key: str) -> Dict[str, Any]:
+    """Páginas/mediabox/rotação/sha256/AcroForm do blank.pdf, sem parsear o PDF (se o manifest estiver em dia)."""
+    return template_manifest.get_manifest(get_blank_pdf_path(city, form_key))
+
+
+class PageRangeError(ValueError):
+    """Páginas fora do template (a API responde 416, não 404)."""
+
+    def __init__(self, start: int, end: int, total: int):
+        super().__init__(f"Páginas inválidas: {start}-{end} (template tem {total})")
+        self.total = total
+
+
+def get_template_pages(city: str, form_key: str, start: int, end: int) -> Tuple[bytes, str]:
+    """PDF só com as páginas start..end do blank (cacheado) + sha256 do blank (para ETag)."""
+    blank_pdf = get_blank_pdf_path(city, form_key)
+    manifest = template_manifest.get_manifest(blank_pdf)
+    total = int(manifest["page_count"])
+    if start < 1 or end < start or end > total:
+        raise PageRangeError(start, end, total)
+    return template_cache.extract_pages(blank_pdf, start, end), manifest["sha256"]
@@ -0,0 +1,181 @@
+# app/template_cache.py
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from pypdf import PdfReader, PdfWriter
+
+from app import metrics
+
+# orçamento de memória do cache (estimado pelo tamanho do blank.pdf em disco)
+TEMPLATE_CACHE_MAX_BYTES = int(os.environ.get("PERMIT_TEMPLATE_CACHE_BYTES", str(64 * 1024 * 1024)))
+# PDFs de página(s) avulsa(s) já extraídos (editor)
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("PERMIT_PAGE_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+
+class _Entry:
+    __slots__ = ("signature", "reader", "nbytes", "lock")
+
+    def __init__(self, signature: tuple, reader: PdfReader, nbytes: int):
+        self.signature = signature
+        self.reader = reader
+        self.nbytes = nbytes
+        # PdfReader lê objetos sob demanda do mesmo buffer → 1 leitor por vez
+        self.lock = threading.Lock()
+
+
+_lock = threading.Lock()
+# path do blank (ou chave de um PDF derivado) -> entry
+_entries: "OrderedDict[object, _Entry]" = OrderedDict()
+_total_bytes = 0
+
+# (path, assinatura, início, fim) -> bytes do PDF
+_page_pdfs: "OrderedDict[tuple, bytes]" = OrderedDict()
+_page_bytes = 0
+
+
+def _signature(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _evict_locked():
+    global _total_bytes
+    # LRU: remove os mais antigos até caber no orçamento (sempre mantém o último)
+    while _total_bytes > TEMPLATE_CACHE_MAX_BYTES and len(_entries) > 1:
+        _, old = _entries.popitem(last=False)
+        _total_bytes -= old.nbytes
+
+
+def _get_entry(path: str) -> _Entry:
+    global _total_bytes
+    path = os.path.abspath(path)
+    sig = _signature(path)
+
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and entry.signature == sig:
+            _entries.move_to_end(path)
+            metrics.inc("permit_template_cache_total", result="hit")
+            return entry
+
+    # parse fora do lock global (outros templates não esperam)
+    with open(path, "rb") as f:
+        data = f.read()
+    entry = _Entry(sig, PdfReader(io.BytesIO(data)), len(data))
+
+    with _lock:
+        old = _entries.pop(path, None)
+        if old is not None:
+            _total_bytes -= old.nbytes
+        _entries[path] = entry
+        _total_bytes += entry.nbytes
+        _evict_locked()
+    metrics.inc("permit_template_cache_total", result="miss")
+
+    return entry
+
+
+def add_template_pages(path: str, writer: PdfWriter) -> list:
+    """
+    Copia as páginas do blank.pdf (parseado e cacheado) para dentro do writer
+    e retorna as cópias. O merge deve ser feito nas cópias: o original do cache
+    nunca é alterado.
+    """
+    entry = _get_entry(path)
+    with entry.lock:
+        return [writer.add_page(page) for page in entry.reader.pages]
+
+
+def clone_template(path: str) -> PdfWriter:
+    """
+    Writer com o documento inteiro do blank (inclui /AcroForm) a partir do leitor cacheado.
+    Usado no preenchimento de campos nativos; o leitor do cache não é alterado.
+    """
+    entry = _get_entry(path)
+    with entry.lock:
+        return PdfWriter(clone_from=entry.reader)
+
+
+def get_derived(key: tuple, build) -> _Entry:
+    """
+    PDF derivado do blank (ex.: blank + overlay estático da company), parseado e
+    cacheado. `key` identifica a versão; `build()` gera os bytes só no miss.
+    Divide o mesmo orçamento/LRU dos blanks.
+    """
+    global _total_bytes
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+    if entry is not None:
+        metrics.inc("permit_static_overlay_total", result="hit")
+        return entry
+
+    metrics.inc("permit_static_overlay_total", result="miss")
+    data = build()
+    entry = _Entry(key, PdfReader(io.BytesIO(data)), len(data))
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _total_bytes -= old.nbytes
+        _entries[key] = entry
+        _total_bytes += entry.nbytes
+        _evict_locked()
+    return entry
+
+
+def add_derived_pages(entry: _Entry, writer: PdfWriter) -> list:
+    """Como add_template_pages, para uma entrada de get_derived()."""
+    with entry.lock:
+        return [writer.add_page(page) for page in entry.reader.pages]
+
+
+def extract_pages(path: str, start: int, end: int) -> bytes:
+    """
+    Páginas start..end (1-based, inclusivo) do blank.pdf como um PDF avulso.
+    Extraído 1x a partir do leitor cacheado; o resultado fica num LRU próprio.
+    """
+    global _page_bytes
+    entry = _get_entry(path)
+    key = (os.path.abspath(path), entry.signature, start, end)
+
+    with _lock:
+        data = _page_pdfs.get(key)
+        if data is not None:
+            _page_pdfs.move_to_end(key)
+    if data is not None:
+        metrics.inc("permit_page_cache_total", result="hit")
+        return data
+
+    metrics.inc("permit_page_cache_total", result="miss")
+    writer = PdfWriter()
+    with entry.lock:
+        if start < 1 or end > len(entry.reader.pages) or start > end:
+            raise ValueError(f"Páginas inválidas: {start}-{end} (template tem {len(entry.reader.pages)})")
+        for i in range(start - 1, end):
+            writer.add_page(entry.reader.pages[i])
+        buf = io.BytesIO()
+        writer.write(buf)
+    data = buf.getvalue()
+
+    with _lock:
+        old = _page_pdfs.pop(key, None)
+        if old is not None:
+            _page_bytes -= len(old)
+        _page_pdfs[key] = data
+        _page_bytes += len(data)
+        while _page_bytes > PAGE_CACHE_MAX_BYTES and len(_page_pdfs) > 1:
+            _, dropped = _page_pdfs.popitem(last=False)
+            _page_bytes -= len(dropped)
+    return data
+
+
+def clear():
+    global _total_bytes, _page_bytes
+    with _lock:
+        _entries.clear()
+        _total_bytes = 0
+        _page_pdfs.clear()
+        _page_bytes = 0
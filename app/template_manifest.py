@@ -0,0 +1,134 @@
+# app/template_manifest.py
+import os
+import hashlib
+import datetime
+import threading
+from typing import Any, Dict, Optional
+
+from pypdf import PdfReader
+
+from app import data_store, metrics
+from app.log import get_logger
+
+# fica ao lado do blank.pdf (gerado; não versionado)
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+log = get_logger("template_manifest")
+
+_lock = threading.Lock()
+# blank_pdf -> (assinatura do blank, manifest)
+_cache: Dict[str, tuple] = {}
+
+
+def _signature(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def manifest_path(blank_pdf: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(blank_pdf)), MANIFEST_NAME)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_manifest(blank_pdf: str) -> Dict[str, Any]:
+    """Parseia o blank.pdf uma vez e extrai o que validação/editor/doctor precisam."""
+    blank_pdf = os.path.abspath(blank_pdf)
+    sig = _signature(blank_pdf)
+    if sig is None:
+        raise ValueError(f"blank.pdf não encontrado: {blank_pdf}")
+
+    with metrics.timer("manifest_build"):
+        reader = PdfReader(blank_pdf)
+        pages = []
+        for i, page in enumerate(reader.pages, start=1):
+            box = [float(v) for v in page.mediabox]
+            pages.append(
+                {
+                    "page": i,
+                    "mediabox": box,
+                    "width": box[2] - box[0],
+                    "height": box[3] - box[1],
+                    "rotation": int(page.rotation or 0),
+                }
+            )
+
+        root = reader.trailer["/Root"]
+        acroform_fields = sorted((reader.get_fields() or {}).keys()) if "/AcroForm" in root else []
+
+        return {
+            "version": MANIFEST_VERSION,
+            "blank": os.path.basename(blank_pdf),
+            "mtime_ns": sig[0],
+            "size": sig[1],
+            "sha256": _sha256(blank_pdf),
+            "page_count": len(pages),
+            "pages": pages,
+            "acroform": "/AcroForm" in root,
+            "acroform_fields": acroform_fields,
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+
+
+def _read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        data = data_store.load_json(path)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION else None
+
+
+def get_manifest(blank_pdf: str) -> Dict[str, Any]:
+    """
+    Manifest do blank.pdf: memória → manifest.json → (re)gera se o blank mudou.
+    O PDF só é parseado quando o manifest falta ou está velho.
+    """
+    blank_pdf = os.path.abspath(blank_pdf)
+    sig = _signature(blank_pdf)
+    if sig is None:
+        raise ValueError(f"blank.pdf não encontrado: {blank_pdf}")
+
+    with _lock:
+        cached = _cache.get(blank_pdf)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+
+    mpath = manifest_path(blank_pdf)
+    manifest = _read_manifest(mpath)
+    if manifest is None or (manifest.get("mtime_ns"), manifest.get("size")) != sig:
+        manifest = build_manifest(blank_pdf)
+        try:
+            data_store.write_json_atomic(mpath, manifest)
+        except OSError:
+            # pasta só-leitura: segue com o manifest em memória
+            log.warning("não foi possível gravar manifest", extra={"fields": {"path": mpath}})
+        log.info("manifest gerado", extra={"fields": {"blank": blank_pdf, "pages": manifest["page_count"]}})
+
+    with _lock:
+        _cache[blank_pdf] = (sig, manifest)
+    return manifest
+
+
+def update_manifest(blank_pdf: str, **extra):
+    """Acrescenta chaves ao manifest (ex.: validation=...) e regrava."""
+    blank_pdf = os.path.abspath(blank_pdf)
+    manifest = {**get_manifest(blank_pdf), **extra}
+    data_store.write_json_atomic(manifest_path(blank_pdf), manifest)
+    with _lock:
+        _cache[blank_pdf] = (_signature(blank_pdf), manifest)
+    return manifest
+
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,148 @@
+# app/template_validation.py
+import os
+import datetime
+import threading
+from typing import Any, Dict, Optional
+
+from app import data_store, metrics, template_manifest
+from app.config_store import OVERRIDES_DIR
+from app.doctor_utils import check_template
+from app.log import get_logger
+
+log = get_logger("validation")
+
+_lock = threading.Lock()
+# (blank, fields, layers) -> (stamp, resultado)
+_validated: Dict[tuple, tuple] = {}
+
+
+def _sig(path: Optional[str]) -> Optional[list]:
+    try:
+        st = os.stat(path)  # type: ignore[arg-type]
+    except (OSError, TypeError):
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _is_override(fields_path: Optional[str]) -> bool:
+    if not fields_path:
+        return False
+    return os.path.abspath(fields_path).startswith(os.path.abspath(OVERRIDES_DIR) + os.sep)
+
+
+def _meta_path(fields_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(fields_path)), "meta.json")
+
+
+def _stamp(fields_sig, layers_sig, blank_sha256: str) -> Dict[str, Any]:
+    return {"fields": fields_sig, "layers": layers_sig, "blank_sha256": blank_sha256}
+
+
+def _load(path: Optional[str]) -> Any:
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return data_store.load_json(path)
+    except ValueError:
+        return None
+
+
+def validate_files(blank_pdf: str, fields_path: Optional[str], layers_path: Optional[str]) -> Dict[str, Any]:
+    """Valida fields/layers contra o manifest do blank (sem parsear o PDF)."""
+    manifest = template_manifest.get_manifest(blank_pdf)
+
+    fields = _load(fields_path)
+    layers = _load(layers_path)
+    result = check_template(
+        fields if fields is not None else {},
+        layers if layers is not None else [],
+        total_pages=int(manifest["page_count"]),
+    )
+    result["stamp"] = _stamp(_sig(fields_path), _sig(layers_path), manifest["sha256"])
+    result["validated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    return result
+
+
+def _read_stored(blank_pdf: str, fields_path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if _is_override(fields_path):
+        meta = _load(_meta_path(fields_path))  # type: ignore[arg-type]
+        v = meta.get("validation") if isinstance(meta, dict) else None
+    else:
+        v = template_manifest.get_manifest(blank_pdf).get("validation")
+    return v if isinstance(v, dict) else None
+
+
+def _store(blank_pdf: str, fields_path: Optional[str], result: Dict[str, Any]):
+    """Override → meta.json da pasta do override; template base → manifest.json do blank."""
+    if _is_override(fields_path):
+        mpath = _meta_path(fields_path)  # type: ignore[arg-type]
+        meta = _load(mpath)
+        meta = dict(meta) if isinstance(meta, dict) else {}
+        meta["validation"] = result
+        data_store.write_json_atomic(mpath, meta)
+    else:
+        template_manifest.update_manifest(blank_pdf, validation=result)
+
+
+def validate_and_store(blank_pdf: str, fields_path: Optional[str], layers_path: Optional[str]) -> Dict[str, Any]:
+    """Roda a validação e grava o resultado junto do template (chamado ao salvar)."""
+    result = validate_files(blank_pdf, fields_path, layers_path)
+    try:
+        _store(blank_pdf, fields_path, result)
+    except OSError:
+        log.warning("não foi possível gravar validação", extra={"fields": {"fields_path": fields_path}})
+
+    with _lock:
+        _validated[(blank_pdf, fields_path, layers_path)] = (result["stamp"], result)
+
+    if not result["ok"]:
+        log.warning(
+            "template com erros de validação",
+            extra={"fields": {"fields_path": fields_path, "errors": len(result["errors"])}},
+        )
+    return result
+
+
+def _ensure(blank_pdf: str, fields_path: Optional[str], layers_path: Optional[str], fields_sig, layers_sig) -> Dict[str, Any]:
+    key = (blank_pdf, fields_path, layers_path)
+    stamp = _stamp(
+        list(fields_sig) if fields_sig else None,
+        list(layers_sig) if layers_sig else None,
+        template_manifest.get_manifest(blank_pdf)["sha256"],
+    )
+
+    with _lock:
+        cached = _validated.get(key)
+    if cached is not None and cached[0] == stamp:
+        metrics.inc("permit_validation_total", result="hit")
+        return cached[1]
+
+    stored = _read_stored(blank_pdf, fields_path)
+    if stored is not None and stored.get("stamp") == stamp:
+        metrics.inc("permit_validation_total", result="stored")
+        with _lock:
+            _validated[key] = (stamp, stored)
+        return stored
+
+    metrics.inc("permit_validation_total", result="validated")
+    return validate_and_store(blank_pdf, fields_path, layers_path)
+
+
+def ensure_validated(blank_pdf: str, plan) -> Dict[str, Any]:
+    """
+    Caminho do render: só confere o carimbo (assinaturas de fields/layers + sha do blank).
+    As assinaturas vêm do plano compilado (sem stat extra). Valida de novo apenas
+    se o template mudou sem passar pelo save (ex.: editado à mão).
+    """
+    fields_sig, layers_sig = plan.signature
+    return _ensure(blank_pdf, plan.fields_path, plan.layers_path, fields_sig, layers_sig)
+
+
+def ensure_validated_files(blank_pdf: str, fields_path: Optional[str], layers_path: Optional[str]) -> Dict[str, Any]:
+    """Mesmo que ensure_validated, a partir dos caminhos (startup / registro de template)."""
+    return _ensure(blank_pdf, fields_path, layers_path, _sig(fields_path), _sig(layers_path))
+
+
+def clear():
+    with _lock:
+        _validated.clear()
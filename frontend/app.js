@@ -43,30 +43,87 @@ async function apiSaveOverride(payload) {
   return r.json();
 }
 
-async function apiGeneratePacket(project_key) {
-  const r = await fetch(`${API_BASE}/api/generate`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ project_key }),
-  });
-  if (!r.ok) throw new Error(await r.text());
-  return r.json();
-}
+// ====== JOBS (geração assíncrona) ======
+// ✅ POST /api/jobs/<tipo> enfileira e devolve job_id; GET /api/jobs/{id} mostra estado/progresso
+const JOB_POLL_MS = 700;
 
-async function apiGenerateCompany(payload) {
-  const r = await fetch(`${API_BASE}/api/generate-company`, {
+async function apiSubmitJob(kind, payload) {
+  const r = await fetch(`${API_BASE}/api/jobs/${kind}`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(payload),
   });
   if (!r.ok) throw new Error(await r.text());
-  return r.json();
+  return (await r.json()).job_id;
+}
+
+async function apiWaitJob(job_id, onProgress) {
+  for (;;) {
+    const r = await fetch(`${API_BASE}/api/jobs/${encodeURIComponent(job_id)}`, {
+      cache: "no-store",
+    });
+    if (!r.ok) throw new Error(await r.text());
+    const { job } = await r.json();
+    if (typeof onProgress === "function") onProgress(job);
+    if (job.state === "done") return job;
+    if (job.state === "failed") throw new Error(job.error || "Job falhou.");
+    await new Promise((res) => setTimeout(res, JOB_POLL_MS));
+  }
+}
+
+// enfileira + espera → mesmo formato do endpoint síncrono ({ ok, ...resultado })
+async function apiRunJob(kind, payload, onProgress) {
+  const job_id = await apiSubmitJob(kind, payload);
+  const job = await apiWaitJob(job_id, onProgress);
+  return { ok: true, job_id, ...(job.result || {}) };
+}
+
+// ZIP de um job "download-*" já concluído
+async function apiDownloadJob(job_id) {
+  const r = await fetch(`${API_BASE}/api/jobs/${encodeURIComponent(job_id)}/download`);
+  if (!r.ok) {
+    const txt = await r.text().catch(() => "");
+    throw new Error(`Falha no download: ${r.status} ${txt}`);
+  }
+  return r.blob();
+}
+
+function jobProgressText(job) {
+  const p = job?.progress || {};
+  if (job?.state === "queued") return "na fila";
+  return p.total ? `${p.done}/${p.total} forms` : job?.state || "";
+}
+
+async function apiGeneratePacket(project_key, onProgress) {
+  return apiRunJob("generate", { project_key }, onProgress);
+}
+
+async function apiGenerateCompany(payload, onProgress) {
+  return apiRunJob("generate-company", payload, onProgress);
+}
+
+// ====== BOOTSTRAP (catálogo + companies + projects + tabelas num request só) ======
+// ✅ "no-cache" + ETag: se nada mudou o servidor responde 304 e o browser usa o cache
+var __bootstrapPromise = null;
+
+function apiBootstrap(force = false) {
+  if (!__bootstrapPromise || force) {
+    __bootstrapPromise = fetch(`${API_BASE}/api/bootstrap`, { cache: "no-cache" })
+      .then(async (r) => {
+        if (!r.ok) throw new Error(await r.text());
+        return r.json();
+      })
+      .catch((e) => {
+        __bootstrapPromise = null;
+        throw e;
+      });
+  }
+  return __bootstrapPromise;
 }
 
 async function apiGetProjects() {
-  const r = await fetch(`${API_BASE}/api/projects`);
-  if (!r.ok) throw new Error(await r.text());
-  return r.json();
+  const b = await apiBootstrap();
+  return { ok: true, projects: b.projects || [] };
 }
 
 async function apiOpenFolder(path) {
@@ -81,29 +138,19 @@ async function apiOpenFolder(path) {
 
 // catálogo
 async function apiCatalogCities() {
-  const r = await fetch(`${API_BASE}/api/catalog/cities`, {
-    cache: "no-store",
-  });
-  if (!r.ok) throw new Error(await r.text());
-  return r.json();
+  const b = await apiBootstrap();
+  return { ok: true, cities: b.cities || [] };
 }
 
 async function apiCatalogForms(city) {
-  const r = await fetch(
-    `${API_BASE}/api/catalog/${encodeURIComponent(city)}/forms`,
-    {
-      cache: "no-store",
-    },
-  );
-  if (!r.ok) throw new Error(await r.text());
-  return r.json();
+  const b = await apiBootstrap();
+  return { ok: true, forms: (b.forms || {})[city] || [] };
 }
 
 // companies
 async function apiCompanies() {
-  const r = await fetch(`${API_BASE}/api/companies`, { cache: "no-store" });
-  if (!r.ok) throw new Error(await r.text());
-  return r.json();
+  const b = await apiBootstrap();
+  return { ok: true, companies: b.companies || [] };
 }
 
 async function apiCompanyUpsert(company_key, data) {
@@ -113,12 +160,18 @@ async function apiCompanyUpsert(company_key, data) {
     body: JSON.stringify({ company_key, data }),
   });
   if (!r.ok) throw new Error(await r.text());
+  // dados mudaram → próximo bootstrap busca a versão nova
+  __bootstrapPromise = null;
   return r.json();
 }
 
 // ====== PREVIEW (via API /api/data/{name}) ======
 async function apiGetData(name) {
-  const r = await fetch(`${API_BASE}/api/data/${name}`, { cache: "no-store" });
+  // tabelas de lookup já vêm no bootstrap
+  const b = await apiBootstrap();
+  if (b.data && name in b.data) return b.data[name] || {};
+
+  const r = await fetch(`${API_BASE}/api/data/${name}`, { cache: "no-cache" });
   if (!r.ok) throw new Error(await r.text());
   const j = await r.json();
   return j.data || {};
@@ -300,7 +353,9 @@ function initCompanyPage() {
 
   if (el.btnRefreshCompanies) {
     el.btnRefreshCompanies.onclick = () =>
-      loadCompaniesIntoSelect().catch(console.error);
+      apiBootstrap(true)
+        .then(() => loadCompaniesIntoSelect())
+        .catch(console.error);
   }
 
   loadCompaniesIntoSelect()
@@ -472,7 +527,11 @@ function initProjectPage() {
           return setStatus(el.apiStatus, "❌ Marque pelo menos 1 permit.");
 
         setStatus(el.apiStatus, "Gerando PDFs...");
-        const res = await apiGenerateCompany({ company_key, city, form_keys });
+        const res = await apiGenerateCompany(
+          { company_key, city, form_keys },
+          (job) =>
+            setStatus(el.apiStatus, `Gerando PDFs... ${jobProgressText(job)}`),
+        );
         lastOutFolder = res.out_folder || null;
         setStatus(el.apiStatus, "✅ Gerado!\n" + JSON.stringify(res, null, 2));
       } catch (e) {
@@ -587,7 +646,13 @@ async function renderPDFByUrl(url) {
   window.__pdfUrl = url;
   window.__pdfPage = window.__pdfPage || 1;
 
-  const task = window.pdfjsLib.getDocument(url);
+  // ✅ Range: o PDF.js baixa só os pedaços da página aberta (não o arquivo inteiro)
+  const task = window.pdfjsLib.getDocument({
+    url,
+    disableAutoFetch: true,
+    disableStream: true,
+    rangeChunkSize: 65536,
+  });
   const pdf = await task.promise;
 
   window.__pdfDoc = pdf;
@@ -854,7 +919,9 @@ async function loadPermit(formKey) {
 
   setApiStatus("Carregando permit...");
 
-  const pdfUrl = `${API_BASE}/api/template/${encodeURIComponent(city)}/${encodeURIComponent(formKey)}/blank.pdf`;
+  const templateBase = `${API_BASE}/api/template/${encodeURIComponent(city)}/${encodeURIComponent(formKey)}`;
+  // ✅ blank.pdf versionado pelo sha256 do manifest → o browser guarda (URL imutável)
+  let pdfUrl = `${templateBase}/blank.pdf`;
 
   const fieldsUrl =
     `${API_BASE}/api/template/${encodeURIComponent(city)}/${encodeURIComponent(formKey)}` +
@@ -865,17 +932,25 @@ async function loadPermit(formKey) {
     `/layers.json?company_key=${encodeURIComponent(company_key || "")}`;
 
   try {
-    const [fieldsRaw, layersRaw] = await Promise.all([
-      fetch(fieldsUrl, { cache: "no-store" }).then(async (r) => {
+    // ✅ "no-cache": usa o cache do browser, mas revalida (ETag → 304 sem corpo)
+    const [fieldsRaw, layersRaw, manifest] = await Promise.all([
+      fetch(fieldsUrl, { cache: "no-cache" }).then(async (r) => {
         if (!r.ok) throw new Error(await r.text());
         return r.json();
       }),
-      fetch(layersUrl, { cache: "no-store" }).then(async (r) => {
+      fetch(layersUrl, { cache: "no-cache" }).then(async (r) => {
         if (!r.ok) throw new Error(await r.text());
         return r.json();
       }),
+      fetch(`${templateBase}/manifest.json`, { cache: "no-cache" })
+        .then((r) => (r.ok ? r.json() : null))
+        .catch(() => null),
     ]);
 
+    if (manifest && manifest.sha256) {
+      pdfUrl = `${templateBase}/blank.pdf?v=${manifest.sha256.slice(0, 16)}`;
+    }
+
     const fields = fieldsRaw.fields || fieldsRaw.data || fieldsRaw;
     const layers = layersRaw.layers || layersRaw.data || layersRaw;
 
@@ -1252,8 +1327,21 @@ async function saveOverrideToApi(layers, fields = {}) {
   });
 
   if (!r.ok) throw new Error(await r.text());
-  setApiStatus("✅ Override salvo.");
-  return r.json();
+  const out = await r.json();
+
+  // ✅ validação roda no save: mostra os erros aqui (o render não valida mais)
+  const v = out.validation;
+  if (v && !v.ok) {
+    const first = v.errors
+      .slice(0, 3)
+      .map((e) => `${e.target} ${e.ref}: ${e.message}`)
+      .join(" | ");
+    setApiStatus(`⚠️ Override salvo com ${v.errors.length} erro(s): ${first}`);
+    console.warn("Validação do override:", v);
+  } else {
+    setApiStatus("✅ Override salvo.");
+  }
+  return out;
 }
 
 
@@ -1460,26 +1548,21 @@ async function saveOverrideToApi(layers, fields = {}) {
 
         setApiStatus("⏳ Gerando ZIP...");
 
-        // ✅ PATCH 2.2 — endpoint /api/download-company
-        const r = await fetch(`${window.API_BASE}/api/download-company`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
+        // ✅ job download-company: acompanha o progresso e baixa o ZIP pronto
+        const res = await apiRunJob(
+          "download-company",
+          {
             company_key,
             city,
             form_keys,
             job_key: s.job_key || null,
             owner_key: s.owner_key || null,
             roof_key: s.roof_key || null,
-          }),
-        });
-
-        if (!r.ok) {
-          const txt = await r.text().catch(() => "");
-          throw new Error(`Falha no download: ${r.status} ${txt}`);
-        }
+          },
+          (job) => setApiStatus(`⏳ Gerando ZIP... ${jobProgressText(job)}`),
+        );
 
-        const blob = await r.blob();
+        const blob = await apiDownloadJob(res.job_id);
         const url = URL.createObjectURL(blob);
 
         const a = document.createElement("a");